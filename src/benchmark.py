@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+from genome import load_genome
+from mod1 import frequency_map, pattern_match_positions
+from mod2 import aprox_pattern_matching, skew_array
+from mod3 import greedy_motif_search
+from mod4 import gibbs_sampler, randomized_motif_search
+
+GENOME_PATH = os.path.join(os.path.dirname(__file__), "../decoded-genomes/vibrio_cholerae.txt")
+SIZES = [10_000, 100_000, 1_000_000]
+# the DnaA box of Vibrio cholerae
+PATTERN = "ATGATCAAG"
+MOTIF_K = 12
+MOTIF_T = 10
+
+def _motif_dna(genome : memoryview) -> List[str]:
+    """
+        Splits genome into MOTIF_T strings of the same length.
+    """
+    length = len(genome) // MOTIF_T
+    return [bytes(genome[i * length:(i + 1) * length]).decode() for i in range(MOTIF_T)]
+
+# name -> (function run on a genome slice, largest slice it is run on)
+BENCHMARKS : Dict[str, tuple] = {
+    "frequency_map": (lambda genome: frequency_map(genome, 9), None),
+    "pattern_match_positions": (lambda genome: pattern_match_positions(PATTERN, genome), None),
+    "skew_array": (lambda genome: skew_array(genome), None),
+    "aprox_pattern_matching": (lambda genome: aprox_pattern_matching(genome, PATTERN, 1), None),
+    "greedy_motif_search": (lambda genome: greedy_motif_search(_motif_dna(genome), MOTIF_K, MOTIF_T), 10_000),
+    "randomized_motif_search": (lambda genome: randomized_motif_search(_motif_dna(genome), MOTIF_K, MOTIF_T, random.Random(0)), None),
+    "gibbs_sampler": (lambda genome: gibbs_sampler(_motif_dna(genome), MOTIF_K, MOTIF_T, 200, random.Random(0)), None),
+}
+
+def measure(function : Callable, genome : memoryview, repeat : int = 3) -> Dict[str, float]:
+    """
+        Runs function on genome and measures it.
+
+        Parameters
+        ---
+            function : Callable
+                Function taking the genome as its only argument.
+            genome : memoryview
+                The genome (or slice of it) to run on.
+            repeat : int
+                Number of timed runs, the fastest one is kept (default 3).
+
+        Returns
+        ---
+            Dict[str, float] : Wall time in seconds, peak memory allocated in bytes
+                and throughput in bases per second.
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(genome)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    # tracing allocations slows the run down, so memory is measured apart
+    tracemalloc.start()
+    try:
+        function(genome)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "bases_per_second": len(genome) / seconds if seconds > 0 else float("inf"),
+    }
+
+def run(genome : memoryview, names : List[str], sizes : List[int], repeat : int = 3) -> Dict[str, Dict[str, float]]:
+    """
+        Runs the given benchmarks over prefixes of genome of each size (and the
+        whole genome), skipping the sizes above each benchmark's limit.
+
+        Parameters
+        ---
+            genome : memoryview
+                The genome.
+            names : List[str]
+                Names of the benchmarks to run.
+            sizes : List[int]
+                Sizes of the genome prefixes, in bases.
+            repeat : int
+                Number of timed runs of each benchmark (default 3).
+
+        Returns
+        ---
+            Dict[str, Dict[str, float]] : The measures, keyed by "name/size".
+    """
+    sizes = sorted({size for size in sizes if size < len(genome)} | {len(genome)})
+    results = {}
+    for name in names:
+        function, limit = BENCHMARKS[name]
+        for size in sizes:
+            if limit is not None and size > limit:
+                continue
+            key = "%s/%d" % (name, size)
+            results[key] = measure(function, genome[:size], repeat)
+            print(_format(key, results[key]), file=sys.stderr)
+    return results
+
+def compare(results : Dict[str, Dict[str, float]], baseline : Dict[str, Dict[str, float]], tolerance : float = 0.2,
+            min_seconds : float = 0.001) -> List[str]:
+    """
+        Compares results against a baseline.
+
+        Parameters
+        ---
+            results : Dict[str, Dict[str, float]]
+                The measures returned by run.
+            baseline : Dict[str, Dict[str, float]]
+                Measures of a previous run.
+            tolerance : float
+                Fraction a wall time or peak memory may grow before it counts
+                as a regression (default 0.2).
+            min_seconds : float
+                Wall time differences below this many seconds are timer noise
+                and never count as a regression (default 0.001).
+
+        Returns
+        ---
+            List[str] : A description of every regression.
+    """
+    regressions = []
+    for key, measures in results.items():
+        if key not in baseline:
+            continue
+        for measure_name in ("seconds", "peak_bytes"):
+            before, after = baseline[key][measure_name], measures[measure_name]
+            if measure_name == "seconds" and after - before < min_seconds:
+                continue
+            if after > before * (1 + tolerance):
+                growth = "%+.0f%%" % (100 * (after / before - 1)) if before > 0 else "from 0"
+                regressions.append("%s %s: %.4g -> %.4g (%s)" % (key, measure_name, before, after, growth))
+    return regressions
+
+def _format(key : str, measures : Dict[str, float]) -> str:
+    return "%-40s %10.4f s %12d B %14.0f bases/s" % (key, measures["seconds"], measures["peak_bytes"], measures["bases_per_second"])
+
+def main(argv : List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks the mod1 - mod4 functions over slices of a genome.")
+    parser.add_argument("--genome", default=GENOME_PATH, help="genome file (default, Vibrio cholerae)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES, help="slice sizes in bases, the whole genome is always run")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, the fastest is kept")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed growth over the baseline (default 0.2)")
+    parser.add_argument("--min-seconds", type=float, default=0.001, help="wall time growth always allowed, in seconds (default 0.001)")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(load_genome(args.genome), args.only, args.sizes, args.repeat)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance, args.min_seconds)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+    Command line entry point, run from the src directory as
+
+        python -m bioinfo skew|count|match|approx|motifs|pipeline [options] [genome ...]
+
+    Genomes are read from the given files (plain text or FASTA), or from the
+    standard input when there are none or the file is "-". Each genome gives
+    one line of JSON on the standard output.
+"""
+import argparse
+import json
+import random
+import sys
+from typing import BinaryIO, List, TextIO
+from genome import iter_genome_chunks, load_genome
+from mod1 import frequent_words, pattern_count, pattern_match_positions
+from mod2 import aprox_pattern_matching, find_ori, minimum_skew_file
+from mod3 import consensus, greedy_motif_search, median_string, score
+from mod4 import gibbs_sampler, greedy_motif_search_with_pseudocounts
+from parallel import multistart_randomized_motif_search
+
+def read_genome(path : str, stdin : BinaryIO = None) -> memoryview:
+    """
+        Reads a genome from path, or from stdin if path is "-". Files are memory
+        mapped, the standard input is read in chunks and joined.
+
+        Parameters
+        ---
+            path : str
+                Path of the genome file, or "-".
+            stdin : BinaryIO
+                Binary standard input (default, sys.stdin.buffer).
+
+        Returns
+        ---
+            memoryview : The nucleotides of the genome.
+    """
+    if path == "-":
+        return memoryview(b"".join(iter_genome_chunks(stdin or sys.stdin.buffer)))
+    return load_genome(path)
+
+def read_sequences(sequences_file : TextIO) -> List[str]:
+    """
+        Reads a list of dna sequences, one per line or one per FASTA record.
+
+        Parameters
+        ---
+            sequences_file : TextIO
+                The opened file.
+
+        Returns
+        ---
+            List[str] : The sequences.
+    """
+    sequences = []
+    fasta = False
+    for line in sequences_file:
+        line = line.strip()
+        if line.startswith(">"):
+            fasta = True
+            sequences.append("")
+        elif line and fasta:
+            sequences[-1] += line
+        elif line:
+            sequences.append(line)
+    return sequences
+
+def skew(args : argparse.Namespace, path : str) -> dict:
+    """
+        Finds the positions of the minimum skew of a genome.
+
+        Parameters
+        ---
+            args : argparse.Namespace
+                The parsed command line.
+            path : str
+                Path of the genome file, or "-" for the standard input.
+
+        Returns
+        ---
+            dict : The positions, under "minimum_skew".
+    """
+    # the skew is streamed without loading the genome
+    genome_file = sys.stdin.buffer if path == "-" else path
+    return {"minimum_skew": minimum_skew_file(genome_file)}
+
+def count(args : argparse.Namespace, path : str) -> dict:
+    """
+        Counts the given pattern in a genome, or finds its most frequent k-mers
+        when there is no pattern.
+
+        Parameters
+        ---
+            args : argparse.Namespace
+                The parsed command line, with the pattern or k.
+            path : str
+                Path of the genome file, or "-" for the standard input.
+
+        Returns
+        ---
+            dict : The pattern and its count, or k, the most frequent k-mers and
+                their count.
+    """
+    genome = read_genome(path)
+    if args.pattern:
+        return {"pattern": args.pattern, "count": pattern_count(genome, args.pattern)}
+    words = frequent_words(genome, args.k)
+    return {"k": args.k, "frequent_words": words, "count": pattern_count(genome, words[0]) if words else 0}
+
+def match(args : argparse.Namespace, path : str) -> dict:
+    """
+        Finds the exact occurrences of the given pattern in a genome.
+
+        Parameters
+        ---
+            args : argparse.Namespace
+                The parsed command line, with the pattern.
+            path : str
+                Path of the genome file, or "-" for the standard input.
+
+        Returns
+        ---
+            dict : The pattern, its count and the positions where it starts.
+    """
+    positions = pattern_match_positions(args.pattern, read_genome(path))
+    return {"pattern": args.pattern, "count": len(positions), "positions": positions}
+
+def approx(args : argparse.Namespace, path : str) -> dict:
+    """
+        Finds the occurrences of the given pattern with up to d mismatches in a genome.
+
+        Parameters
+        ---
+            args : argparse.Namespace
+                The parsed command line, with the pattern and d.
+            path : str
+                Path of the genome file, or "-" for the standard input.
+
+        Returns
+        ---
+            dict : The pattern, d, the count and the positions of the occurrences.
+    """
+    positions = aprox_pattern_matching(read_genome(path), args.pattern, args.d)
+    return {"pattern": args.pattern, "d": args.d, "count": len(positions), "positions": positions}
+
+def motifs(args : argparse.Namespace, path : str) -> dict:
+    """
+        Searches for motifs in a file of sequences with the chosen method. The
+        restarts of the randomized search run in a pool of processes.
+
+        Parameters
+        ---
+            args : argparse.Namespace
+                The parsed command line, with k, the method and its options.
+            path : str
+                Path of the sequences file, or "-" for the standard input.
+
+        Returns
+        ---
+            dict : k, the method and the best motifs with their consensus and score,
+                or the median string.
+    """
+    if path == "-":
+        dna = read_sequences(sys.stdin)
+    else:
+        with open(path) as sequences_file:
+            dna = read_sequences(sequences_file)
+    t = len(dna)
+
+    if args.method == "greedy":
+        search = greedy_motif_search_with_pseudocounts if args.pseudocounts else greedy_motif_search
+        best_motifs = search(dna, args.k, t)
+    elif args.method == "randomized":
+        best_motifs = multistart_randomized_motif_search(dna, args.k, t, args.restarts, args.seed, args.patience, workers=args.workers)[0]
+    elif args.method == "gibbs":
+        rng = random.Random(args.seed)
+        best_motifs = gibbs_sampler(dna, args.k, t, args.n, rng)
+        for _ in range(args.restarts - 1):
+            candidate = gibbs_sampler(dna, args.k, t, args.n, rng)
+            if score(candidate) < score(best_motifs):
+                best_motifs = candidate
+    else:
+        return {"k": args.k, "method": args.method, "median_string": median_string(dna, args.k)}
+
+    return {"k": args.k, "method": args.method, "motifs": best_motifs, "consensus": consensus(best_motifs), "score": score(best_motifs)}
+
+def pipeline(args : argparse.Namespace, path : str) -> dict:
+    """
+        Runs mod2.find_ori on a genome: the minimum skew, then the candidate
+        DnaA boxes in the window around it.
+
+        Parameters
+        ---
+            args : argparse.Namespace
+                The parsed command line, with the window, k, d and top.
+            path : str
+                Path of the genome file, or "-" for the standard input.
+
+        Returns
+        ---
+            dict : The result of find_ori.
+    """
+    return find_ori(read_genome(path), args.window, args.k, args.d, args.top)
+
+def parser() -> argparse.ArgumentParser:
+    """
+        The command line parser, each subcommand sets the function it runs.
+    """
+    main_parser = argparse.ArgumentParser(prog="bioinfo", description="Genome analysis from the command line, with JSON output.")
+    subparsers = main_parser.add_subparsers(dest="command", required=True)
+
+    def add(name, function, description):
+        subparser = subparsers.add_parser(name, help=description)
+        subparser.set_defaults(function=function)
+        return subparser
+
+    skew_parser = add("skew", skew, "positions of the minimum skew")
+    count_parser = add("count", count, "most frequent k-mers, or the count of a pattern")
+    count_parser.add_argument("-k", type=int, default=9, help="k-mer length (default 9)")
+    count_parser.add_argument("--pattern", help="count this pattern instead")
+    match_parser = add("match", match, "positions of a pattern")
+    match_parser.add_argument("-p", "--pattern", required=True, help="pattern to search for")
+    approx_parser = add("approx", approx, "positions of a pattern with up to d mismatches")
+    approx_parser.add_argument("-p", "--pattern", required=True, help="pattern to search for")
+    approx_parser.add_argument("-d", type=int, default=1, help="maximum mismatches (default 1)")
+    motifs_parser = add("motifs", motifs, "motifs of a file of sequences, one per line or FASTA record")
+    motifs_parser.add_argument("-k", type=int, required=True, help="motif length")
+    motifs_parser.add_argument("--method", choices=["greedy", "randomized", "gibbs", "median"], default="greedy")
+    motifs_parser.add_argument("--pseudocounts", action="store_true", help="greedy search with pseudocounts")
+    motifs_parser.add_argument("--restarts", type=int, default=1, help="runs of the randomized searches (default 1)")
+    motifs_parser.add_argument("--patience", type=int, help="stop the randomized search after this many restarts without improvement")
+    motifs_parser.add_argument("--workers", type=int, help="processes running the randomized restarts (default, one per CPU)")
+    motifs_parser.add_argument("-n", type=int, default=100, help="Gibbs sampler iterations (default 100)")
+    motifs_parser.add_argument("--seed", type=int, help="random seed")
+    pipeline_parser = add("pipeline", pipeline, "candidate DnaA boxes around the minimum skew, on both strands")
+    pipeline_parser.add_argument("-k", type=int, default=9, help="k-mer length (default 9)")
+    pipeline_parser.add_argument("-d", type=int, default=1, help="maximum mismatches (default 1)")
+    pipeline_parser.add_argument("--window", type=int, default=500, help="window length (default 500)")
+    pipeline_parser.add_argument("--top", type=int, default=10, help="number of candidates (default 10)")
+
+    for subparser in (skew_parser, count_parser, match_parser, approx_parser, motifs_parser, pipeline_parser):
+        subparser.add_argument("genomes", nargs="*", default=["-"], help='input files ("-" or none for the standard input)')
+    return main_parser
+
+def main(argv : List[str] = None) -> int:
+    args = parser().parse_args(argv)
+    for path in args.genomes:
+        result = {"command": args.command, "input": path}
+        result.update(args.function(args, path))
+        json.dump(result, sys.stdout)
+        sys.stdout.write("\n")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
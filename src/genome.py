@@ -0,0 +1,169 @@
+import mmap
+import os
+import random
+import re
+import tempfile
+from typing import BinaryIO, Iterator, Union
+import numpy as np
+
+_WHITESPACE = re.compile(rb"\s")
+_NON_WHITESPACE = re.compile(rb"\S")
+# False for the bytes dropped when compacting a genome
+_KEEP = np.ones(256, dtype=bool)
+_KEEP[list(b" \t\r\n\v\f")] = False
+
+def load_genome(path : str) -> memoryview:
+    """
+        Loads a genome from a plain text or FASTA file as a read-only view of
+        its nucleotides.
+
+        Plain text files without line breaks inside the sequence are memory-mapped
+        and the view points straight into the mapping, so no copy is made and every
+        process that loads the same file shares its pages. FASTA files and files
+        wrapped in lines are compacted once into a single byte buffer, dropping the
+        header and the line breaks. Only the first record of a FASTA file is read.
+
+        Parameters
+        ---
+            path : str
+                Path of the genome file.
+
+        Returns
+        ---
+            memoryview : Read-only view of the nucleotide bytes of the genome. It can be
+                sliced without copying and passed to the mod1/mod2 functions.
+    """
+    with open(path, "rb") as genome_file:
+        try:
+            mapping = mmap.mmap(genome_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files can't be mapped
+            return memoryview(b"")
+
+    if mapping[:1] == b">":
+        return memoryview(_compact_buffer(_first_record(mapping)))
+
+    whitespace = _WHITESPACE.search(mapping)
+    if whitespace is None:
+        return memoryview(mapping)
+
+    # a trailing line break still allows a zero-copy view of what precedes it
+    if _NON_WHITESPACE.search(mapping, whitespace.start()) is None:
+        return memoryview(mapping)[:whitespace.start()]
+
+    return memoryview(_compact_buffer(mapping))
+
+def _first_record(mapping : mmap.mmap) -> memoryview:
+    """
+        View of the sequence lines of the first record of a memory-mapped
+        FASTA file.
+    """
+    start = mapping.find(b"\n") + 1
+    if start == 0:
+        return memoryview(b"")
+
+    end = mapping.find(b"\n>", start)
+    return memoryview(mapping)[start:] if end < 0 else memoryview(mapping)[start:end]
+
+def _compact(sequence : bytes) -> bytes:
+    """
+        Removes line breaks and any other whitespace from sequence.
+    """
+    return bytes(sequence).translate(None, b" \t\r\n\v\f")
+
+def _compact_buffer(buffer : memoryview) -> np.ndarray:
+    """
+        Read-only array with the bytes of buffer (such as a memory mapping)
+        other than whitespace, copied in a single pass.
+    """
+    codes = np.frombuffer(buffer, dtype=np.uint8)
+    compacted = codes[_KEEP[codes]]
+    compacted.flags.writeable = False
+    return compacted
+
+def iter_genome_chunks(genome_file : Union[str, BinaryIO], chunk_size : int = 1 << 20) -> Iterator[bytes]:
+    """
+        Streams the nucleotides of a plain text or FASTA genome in chunks,
+        dropping headers and line breaks, so genomes of any size can be scanned
+        with constant memory. Only the first record of a FASTA file is read.
+
+        Parameters
+        ---
+            genome_file : Union[str, BinaryIO]
+                Path of the genome file, or a file (such as sys.stdin.buffer)
+                opened in binary mode.
+            chunk_size : int
+                Bytes read per chunk (default 1 MiB).
+
+        Returns
+        ---
+            Iterator[bytes] : Consecutive pieces of the genome.
+    """
+    if isinstance(genome_file, (str, os.PathLike)):
+        with open(genome_file, "rb") as opened_file:
+            yield from iter_genome_chunks(opened_file, chunk_size)
+        return
+
+    in_header = False
+    line_start = True
+    records = 0
+
+    while True:
+        chunk = genome_file.read(chunk_size)
+        if not chunk:
+            return
+
+        pieces = []
+        position = 0
+        finished = False
+
+        while position < len(chunk):
+            if line_start and chunk[position:position + 1] == b">":
+                if records > 0:
+                    finished = True
+                    break
+                records += 1
+                in_header = True
+
+            newline = chunk.find(b"\n", position)
+            end = len(chunk) if newline < 0 else newline + 1
+            if not in_header:
+                pieces.append(chunk[position:end])
+            elif newline >= 0:
+                in_header = False
+            line_start = newline >= 0
+            position = end
+
+        sequence = _compact(b"".join(pieces))
+        if sequence:
+            yield sequence
+        if finished:
+            return
+
+def test_functions():
+    # the loaded and streamed genomes of plain text and FASTA files, wrapped or
+    # not, against the sequence written to them
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "genome.txt")
+        for trial in range(50):
+            sequence = "".join(rng.choice("ACGT") for _ in range(rng.randint(0, 500)))
+            lines = [sequence[i:i + 60] for i in range(0, len(sequence), 60)]
+            contents = [
+                sequence,
+                sequence + "\n",
+                "\n".join(lines) + "\n",
+                "\r\n".join(lines),
+                ">record 1\n" + "\n".join(lines) + "\n>record 2\nACGT\n",
+            ]
+            for content in contents:
+                with open(path, "w", newline="") as genome_file:
+                    genome_file.write(content)
+                genome = load_genome(path)
+                assert bytes(genome) == sequence.encode() and genome.readonly
+                for chunk_size in (1, 7, 1 << 20):
+                    assert b"".join(iter_genome_chunks(path, chunk_size)) == sequence.encode()
+    print("genome checks passed")
+
+if __name__ == '__main__':
+    test_functions()
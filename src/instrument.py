@@ -0,0 +1,201 @@
+import functools
+import json
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+import mod3
+import mod4
+
+# functions wrapped when instrumentation is enabled, the motif searches are
+# included so the hot functions show up under the search that called them
+FUNCTIONS = [
+    "greedy_motif_search",
+    "greedy_motif_search_with_pseudocounts",
+    "_greedy_trials",
+    "randomized_motif_search",
+    "gibbs_sampler",
+    "motifs",
+    "profile_with_pseudocounts",
+    "profile_most_probable_kmer",
+    "window_log_probabilities",
+    "_gibbs_profile",
+    "_sample_window",
+    "score",
+]
+MODULES = [mod3, mod4]
+
+class Recorder:
+    """
+        Call counts, cumulative time and call stacks of the instrumented
+        functions, and the score of every iteration of the motif searches.
+    """
+
+    def __init__(self):
+        self.calls : Dict[str, int] = defaultdict(int)
+        self.seconds : Dict[str, float] = defaultdict(float)
+        # self time (without the instrumented functions it called) per call stack
+        self.stacks : Dict[str, float] = defaultdict(float)
+        # search -> list of runs, each a list of the score of every iteration
+        self.scores : Dict[str, List[List[int]]] = defaultdict(list)
+        self._stack : List[str] = []
+        self._children : List[float] = []
+
+    def wrap(self, function : Callable) -> Callable:
+        """
+            Returns function wrapped to record its calls on this recorder.
+        """
+        name = function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            self._stack.append(name)
+            self._children.append(0.0)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = self._children.pop()
+                self.stacks[";".join(self._stack)] += elapsed - children
+                self._stack.pop()
+                if self._children:
+                    self._children[-1] += elapsed
+                # recursive calls are only timed once, by the outermost call
+                if name not in self._stack:
+                    self.seconds[name] += elapsed
+                self.calls[name] += 1
+
+        return wrapper
+
+    def iteration(self, search : str, iteration : int, score : int) -> None:
+        """
+            Records the score of an iteration of a motif search.
+        """
+        if iteration == 0:
+            self.scores[search].append([])
+        self.scores[search][-1].append(score)
+
+    def report(self) -> dict:
+        """
+            The recorded data, sorted by cumulative time.
+
+            Returns
+            ---
+                dict : With a "functions" entry holding the calls, cumulative
+                    seconds and seconds per call of each function, and a "scores"
+                    entry holding the per-iteration scores of each search.
+        """
+        functions = {}
+        for name in sorted(self.calls, key=lambda name: -self.seconds[name]):
+            functions[name] = {
+                "calls": self.calls[name],
+                "seconds": self.seconds[name],
+                "seconds_per_call": self.seconds[name] / self.calls[name],
+            }
+        return {"functions": functions, "scores": dict(self.scores)}
+
+    def write_json(self, path : str) -> None:
+        """
+            Writes the report to path as JSON.
+        """
+        with open(path, "w") as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
+    def write_collapsed(self, path : str) -> None:
+        """
+            Writes the call stacks to path in the collapsed format read by
+            flamegraph.pl and speedscope, one "caller;callee microseconds" line
+            per stack.
+        """
+        with open(path, "w") as stacks_file:
+            for stack, seconds in sorted(self.stacks.items()):
+                stacks_file.write("%s %d\n" % (stack, round(seconds * 1e6)))
+
+_originals : List[tuple] = []
+
+def enable(recorder : Recorder = None) -> Recorder:
+    """
+        Replaces the hot functions of mod3 and mod4 by wrappers that record
+        their calls, and hooks the iterations of the motif searches. Until this
+        is called the only cost is a check of mod4.iteration_hook per iteration.
+
+        Parameters
+        ---
+            recorder : Recorder
+                Where to record (default, a new one).
+
+        Returns
+        ---
+            Recorder : The recorder.
+    """
+    if _originals:
+        raise RuntimeError("instrumentation is already enabled")
+    recorder = recorder or Recorder()
+
+    # a function imported in several modules gets the same wrapper in all of them
+    wrappers = {}
+    for module in MODULES:
+        for name in FUNCTIONS:
+            if hasattr(module, name):
+                function = getattr(module, name)
+                if function not in wrappers:
+                    wrappers[function] = recorder.wrap(function)
+                _originals.append((module, name, function))
+                setattr(module, name, wrappers[function])
+
+    _originals.append((mod4, "iteration_hook", mod4.iteration_hook))
+    mod4.iteration_hook = recorder.iteration
+    return recorder
+
+def disable() -> None:
+    """
+        Restores the functions replaced by enable.
+    """
+    while _originals:
+        module, name, function = _originals.pop()
+        setattr(module, name, function)
+
+@contextmanager
+def instrumented(recorder : Recorder = None) -> Iterator[Recorder]:
+    """
+        Enables the instrumentation inside a with block.
+
+        Parameters
+        ---
+            recorder : Recorder
+                Where to record (default, a new one).
+
+        Returns
+        ---
+            Iterator[Recorder] : The recorder.
+    """
+    recorder = enable(recorder)
+    try:
+        yield recorder
+    finally:
+        disable()
+
+def test_functions():
+    # the instrumented searches return what the plain ones return, record the
+    # helpers they call, and are restored afterwards
+    dna = ["".join(random.Random(i).choice("ACGT") for _ in range(40)) for i in range(5)]
+    originals = {(module, name) : getattr(module, name) for module in MODULES for name in FUNCTIONS if hasattr(module, name)}
+    expected = (mod3.greedy_motif_search(dna, 6, 5), mod4.gibbs_sampler(dna, 6, 5, 50, random.Random(0)))
+
+    with instrumented() as recorder:
+        assert (mod3.greedy_motif_search(dna, 6, 5), mod4.gibbs_sampler(dna, 6, 5, 50, random.Random(0))) == expected
+    assert all(getattr(module, name) is function for (module, name), function in originals.items())
+    assert mod4.iteration_hook is None
+
+    report = recorder.report()
+    assert report["functions"]["_greedy_trials"]["calls"] == 1
+    assert report["functions"]["window_log_probabilities"]["calls"] == 4 * 35 + 50
+    assert report["functions"]["_sample_window"]["calls"] == 50
+    assert [len(run) for run in report["scores"]["gibbs_sampler"]] == [50]
+    assert "greedy_motif_search;_greedy_trials;window_log_probabilities" in recorder.stacks
+    print("instrument checks passed")
+
+if __name__ == '__main__':
+    test_functions()
@@ -1,70 +1,89 @@
-from typing import Dict, List
+import heapq
+import io
+import os
+import random
+import re
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+import numpy as np
 
 #1.1
-def pattern_count(text : str, pattern : str) -> int:
+def pattern_count(text : str, pattern : str, index : "GenomeIndex" = None, circular : bool = False) -> int:
     """ 
 		Counts the times the given pattern is present in text.
 		
 		Parameters
 		---
 			text : str
-				The text to search in.
+				The text to search in (str, bytes or any bytes-like object).
 			pattern : str
 				The pattern to search in text.
+			index : GenomeIndex
+				Optional index built from text. When given, the count is answered
+				from the index without scanning text (default None).
+			circular : bool
+				Treat text as a circular genome, so the matches that wrap around
+				its end are counted too (default False). The index is not used then.
 		
 		Returns
 		---
 			int : How many times the pattern string is present in text.
 	"""
-    count = 0
-    pattern_len = len(pattern)
-    text_len = len(text)
+    if index is not None and not circular:
+        return index.count(pattern)
 
-    for i in range(text_len - pattern_len + 1):
-        
-        if(text[i : i + pattern_len] == pattern):
-            count += 1
-    
-    return count
+    return len(_match_positions(text, pattern, circular))
 
 #1.2
-def pattern_count_kmer(text : str, k : int) -> str:
+def pattern_count_kmer(text : str, k : int, top_n : int = None):
 	
 	"""
-		Returns the most frequent k-mer in text.
-		
+		Returns the most frequent k-mer in text in a single pass. Every k-mer
+		is counted from its first appearance on, ignoring the appearances that
+		overlap that first one, and ties go to the k-mer that appears first.
+
 		Parameters
 		---
 			text : str
 				Nucleotide equence to search in.
 			k : int
 				Length of the mer.
+			top_n : int
+				If given, return the top_n most frequent k-mers with their
+				counts instead of only the most frequent one (default None).
 
 		Returns
 		---
-			int : Most frequent k-mer.
+			str : Most frequent k-mer ('' if text is shorter than k), or
+			List[Tuple[str, int]] : The top_n k-mers and their counts, most frequent first.
 	"""
-	result = ''
-	count = 0
-	for i in range(len(text) - k + 1):
-		step = i + k
-		mer = text[i:step]
-		match_count = 1
-		
-		for j in range(step, len(text) - k +1):
+	if k <= 32:
+		codes, valid = kmer_codes(text, k)
+	if k > 32 or not valid.all():
+		return _string_pattern_count_kmer(_as_str(text), k, top_n)
 
-			if ( text[j:j+k] == mer ):
-				match_count += 1
+	kmers, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+	counted = np.arange(len(codes)) >= first[inverse] + k
+	counts = 1 + np.bincount(inverse[counted], minlength=len(kmers))
 
-		if( match_count > count):
-			result = mer
-			count = match_count
-	
-	return result
+	if top_n is None:
+		if len(kmers) == 0:
+			return ''
+		most_freq = np.flatnonzero(counts == counts.max())
+		best = most_freq[np.argmin(first[most_freq])]
+		return decode_kmers(kmers[best:best + 1], k)[0]
 
+	# only the k-mers that can make it to the top go through the heap
+	if len(counts) > top_n > 0:
+		threshold = np.partition(counts, len(counts) - top_n)[len(counts) - top_n]
+		candidates = np.flatnonzero(counts >= threshold)
+	else:
+		candidates = np.arange(len(counts))
+
+	top = heapq.nsmallest(top_n, zip((-counts[candidates]).tolist(), first[candidates].tolist(), candidates.tolist()))
+	return [(decode_kmers(kmers[i:i + 1], k)[0], -count) for count, _, i in top]
 
 #1.3.1
-def frequency_map(text : str, k : int) -> Dict[str, int]:
+def frequency_map(text : str, k : int, circular : bool = False) -> Dict[str, int]:
 	"""
 		Creates a frequency map whose key is a k-mer and its
 		value is the times that mer is present in text.
@@ -74,51 +93,143 @@ def frequency_map(text : str, k : int) -> Dict[str, int]:
 			text : str
 				Nucleotide string to search for k-mers.
 			k : int
-				Length of the mers in the frequency map.
+				Length of the mers in the frequency map. Up to 32 they are
+				counted packed into integers, longer ones (and the ones with
+				symbols other than ACGT) as strings.
+			circular : bool
+				Treat text as a circular genome, so the k-mers that wrap around
+				its end are counted too (default False).
 		
 		Returns
 		---
 			Dict[str, int] : Dictionary of k-mers and the times they are present in text.
 	"""
+	# k-mers longer than 32 can't be packed, count them as strings
+	if k > 32:
+		text = _as_str(text)
+		return _string_frequency_map(_circular(text, k) if circular else text, k)
 
-	text_len = len(text)
-	freq_map = {}
+	codes, positions, others = _split_windows(text, k, circular)
+	kmers, counts = _count_codes(codes, k)
+	first = _first_positions(codes, kmers)
+	if positions is not None:
+		first = positions[first]
 
-	for i in range(text_len - k + 1):
-		pattern = text[i:i+k]
-		if (pattern in freq_map):
-			freq_map[pattern] += 1
-		else:
-			freq_map[pattern] = 1
-
-	return freq_map
+	# the packed k-mers and the ones with other symbols, merged in order of first appearance
+	words = decode_kmers(kmers, k) + list(others)
+	first = np.concatenate((first, np.array([position for position, _ in others.values()], dtype=np.int64)))
+	counts = counts.tolist() + [count for _, count in others.values()]
+	return {words[i] : counts[i] for i in np.argsort(first, kind="stable").tolist()}
 
 #1.3.2
-def frequent_words(text, k):
+def frequent_words(text, k, circular=False):
 	"""
-		Creates a frequency map whose key is a k-mer and its
-		value is the times that mer is present in text.
+		Finds the most frequent k-mers in text.
 
 		Parameters
 		---
 			text : str
 				Nucleotide string to search for k-mers.
 			k : int
-				Length of the mers in the frequency map.
+				Length of the mers. Up to 32 they are counted packed into
+				integers, longer ones (and the ones with symbols other than
+				ACGT) as strings.
+			circular : bool
+				Treat text as a circular genome, so the k-mers that wrap around
+				its end are counted too (default False).
 		
 		Returns
 		---
-			Dict[str, int] : Dictionary of k-mers and the times they are present in text.
+			List[str] : The most frequent k-mers, in order of first appearance in text
+				(empty if text is shorter than k).
 	"""
-	freq_map = frequency_map(text, k)
-	most_freq = max(freq_map.values())
-	result = []
-	
-	for key in freq_map:
-		if (freq_map[key] == most_freq):
-			result.append(key)
-	
-	return result
+	if k > 32:
+		freq_map = frequency_map(text, k, circular)
+		most_freq = max(freq_map.values(), default=0)
+		return [key for key in freq_map if freq_map[key] == most_freq]
+
+	codes, positions, others = _split_windows(text, k, circular)
+	kmers, counts = _count_codes(codes, k)
+	most_freq = max(int(counts.max()) if len(counts) else 0, max((count for _, count in others.values()), default=0))
+	if most_freq == 0:
+		return []
+
+	most_freq_kmers = kmers[counts == most_freq]
+	first = _first_positions(codes, most_freq_kmers)
+	if positions is not None:
+		first = positions[first]
+
+	words = decode_kmers(most_freq_kmers, k) + [kmer for kmer, (_, count) in others.items() if count == most_freq]
+	first = np.concatenate((first, np.array([others[word][0] for word in words[len(most_freq_kmers):]], dtype=np.int64)))
+	return [words[i] for i in np.argsort(first, kind="stable").tolist()]
+
+#1.3.3
+def find_clumps(genome : str, k : int, L : int, t : int) -> Dict[str, List[int]]:
+	"""
+		Finds the k-mers that form (L, t)-clumps in genome, that is, appear at
+		least t times in a window of length L. The k-mer counts are updated as
+		the window slides, adding the k-mer that enters it and dropping the
+		one that leaves it, so the whole genome is scanned once.
+
+		Parameters
+		---
+			genome : str
+				Nucleotide string to search for clumps.
+			k : int
+				Length of the mers.
+			L : int
+				Length of the window.
+			t : int
+				Minimum times a k-mer has to appear in a window to form a clump.
+
+		Returns
+		---
+			Dict[str, List[int]] : Each k-mer forming a clump, in order of discovery, with
+				the start position of every window where it appears at least t times.
+	"""
+	span = L - k + 1
+	if span <= 0 or len(genome) < L:
+		return {}
+
+	packed = False
+	if k <= 32:
+		codes, valid = kmer_codes(genome, k)
+		packed = valid.all()
+
+	if packed:
+		kmers = codes.tolist()
+		counts = [0] * 4**k if k <= _DENSE_MAX_K else dict.fromkeys(kmers, 0)
+	else:
+		genome = _as_str(genome)
+		kmers = [genome[i:i+k] for i in range(len(genome) - k + 1)]
+		counts = dict.fromkeys(kmers, 0)
+
+	# the k-mers whose count in the current window is at least t
+	active = {}
+	clumps = {}
+
+	for kmer in kmers[:span]:
+		counts[kmer] += 1
+		if counts[kmer] == t:
+			active[kmer] = None
+
+	for start in range(len(kmers) - span + 1):
+		if start > 0:
+			kmer = kmers[start - 1]
+			counts[kmer] -= 1
+			if counts[kmer] == t - 1:
+				del active[kmer]
+			kmer = kmers[start + span - 1]
+			counts[kmer] += 1
+			if counts[kmer] == t:
+				active[kmer] = None
+
+		for kmer in active:
+			clumps.setdefault(kmer, []).append(start)
+
+	if packed:
+		return dict(zip(decode_kmers(list(clumps), k), clumps.values()))
+	return clumps
 
 #1.4.1
 def reverse(pattern):
@@ -137,27 +248,30 @@ def reverse(pattern):
 	return pattern[::-1]
 
 #1.4.2
+_COMPLEMENT = str.maketrans("ACGT", "TGCA")
+_BYTES_COMPLEMENT = bytes.maketrans(b"ACGT", b"TGCA")
+_ARRAY_COMPLEMENT = np.frombuffer(_BYTES_COMPLEMENT, dtype=np.uint8)
+
 def complement(pattern):
 	"""
-		Returns the complement of the nucleotide(pattern).
+		Returns the complement of the nucleotide(pattern). Symbols other
+		than ACGT are left as they are.
 
 		Parameters
 		---
 			pattern : str
-				String of nucleotides.
+				String of nucleotides (str, bytes or any bytes-like object).
 		
 		Returns
 		---
-			str : The complement of the given string of nucleotides.
+			str : The complement of the given string of nucleotides, bytes
+				if pattern is not a str.
 
 	"""
-	comp_map = {"T":"A", "A":"T", "C":"G", "G":"C"}
-	result = ""
+	if isinstance(pattern, (str, bytes, bytearray)):
+		return pattern.translate(_COMPLEMENT if isinstance(pattern, str) else _BYTES_COMPLEMENT)
 
-	for char in pattern:
-		result += comp_map[char]
-	
-	return result
+	return _ARRAY_COMPLEMENT[_as_array(pattern)].tobytes()
 
 #1.4.3
 def reverse_complement(pattern):
@@ -167,16 +281,67 @@ def reverse_complement(pattern):
 		Parameters
 		---
 			pattern : str
-				String of nucleotides.
+				String of nucleotides (str, bytes or any bytes-like object).
+
+		Returns
+		---
+			str : The reverse complement of the given string of nucleotides,
+				bytes if pattern is not a str.
+	"""
+	if isinstance(pattern, (str, bytes, bytearray)):
+		return complement(reverse(pattern))
+
+	return _ARRAY_COMPLEMENT[_as_array(pattern)[::-1]].tobytes()
+
+#1.4.3.1
+def reverse_complement_chunks(genome_file : BinaryIO, chunk_size : int = 1 << 20) -> Iterator[bytes]:
+	"""
+		Streams the reverse complement of a genome file, reading it backwards
+		one chunk at a time so only a chunk is held in memory. Line breaks and
+		other whitespace are dropped.
+
+		Parameters
+		---
+			genome_file : BinaryIO
+				Seekable file opened in binary mode with the nucleotide string.
+			chunk_size : int
+				Bytes read per chunk (default 1 MiB).
 
 		Returns
 		---
-			str : The reverse complement of the given string of nucleotides.
+			Iterator[bytes] : Consecutive pieces of the reverse complement.
+	"""
+	end = genome_file.seek(0, os.SEEK_END)
+
+	while end > 0:
+		start = max(0, end - chunk_size)
+		genome_file.seek(start)
+		chunk = genome_file.read(end - start).translate(_BYTES_COMPLEMENT, b" \t\r\n")
+		end = start
+		if chunk:
+			yield chunk[::-1]
+
+#1.4.3.2
+def reverse_complement_file(genome_path : str, output_path : str, chunk_size : int = 1 << 20) -> None:
+	"""
+		Writes the reverse complement of the genome in genome_path to
+		output_path, streaming it chunk by chunk.
+
+		Parameters
+		---
+			genome_path : str
+				Path of the file with the nucleotide string.
+			output_path : str
+				Path of the file to write the reverse complement to.
+			chunk_size : int
+				Bytes read per chunk (default 1 MiB).
 	"""
-	return reverse(complement(pattern))
+	with open(genome_path, "rb") as genome_file, open(output_path, "wb") as output_file:
+		for chunk in reverse_complement_chunks(genome_file, chunk_size):
+			output_file.write(chunk)
 
 #1.4.4
-def pattern_match_positions(pattern : str, genome : str) -> List[int]:
+def pattern_match_positions(pattern : str, genome : str, index : "GenomeIndex" = None, circular : bool = False) -> List[int]:
 	"""
 		Returns a list with the positions in genome where
 		pattern starts.
@@ -186,19 +351,579 @@ def pattern_match_positions(pattern : str, genome : str) -> List[int]:
 			pattern : str
 				The pattern to find.
 			genome : str
-				The genome string where pattern positions are going to be searched.
+				The genome string where pattern positions are going to be searched
+				(str, bytes or any bytes-like object).
+			index : GenomeIndex
+				Optional index built from genome. When given, the positions are
+				read from the index without scanning genome (default None).
+			circular : bool
+				Treat genome as circular, so the matches that wrap around its end
+				are found too (default False). The index is not used then.
 		
 		Returns
 		---
 			List[int] : List of all positions where the given pattern starts 
 				in the given genome string.
 	"""
-	positions = []
-	genome_len = len(genome)
-	pattern_len = len(pattern)
-    
-	for i in range(genome_len - pattern_len + 1):
-		if(genome[i:i + pattern_len] == pattern):
-			positions.append(i)
-	
-	return positions
+	if index is not None and not circular:
+		return index.positions(pattern)
+
+	return _match_positions(genome, pattern, circular).tolist()
+
+
+#1.5.1
+def suffix_array(text : str) -> np.ndarray:
+	"""
+		Builds the suffix array of text by prefix doubling. The empty suffix
+		(position len(text)) is included and sorts first, as if text ended
+		with a sentinel smaller than any character.
+
+		Parameters
+		---
+			text : str
+				The text (str or bytes-like) to index.
+
+		Returns
+		---
+			np.ndarray : Starting positions of the suffixes of text in
+				lexicographic order.
+	"""
+	buffer = _as_array(text)
+	n = len(buffer) + 1
+
+	# rank 0 is the sentinel, real characters are ranked from 1
+	rank = np.zeros(n, dtype=np.int64)
+	rank[:-1] = buffer.astype(np.int64) + 1
+	sa = np.argsort(rank, kind="stable")
+	step = 1
+
+	while True:
+		second = np.zeros(n, dtype=np.int64)
+		if step < n:
+			second[:n - step] = rank[step:]
+		keys = rank * (int(rank.max()) + 1) + second
+		sa = np.argsort(keys, kind="stable")
+		sorted_keys = keys[sa]
+		new_rank = np.empty(n, dtype=np.int64)
+		new_rank[sa] = np.concatenate(([0], np.cumsum(sorted_keys[1:] != sorted_keys[:-1])))
+		rank = new_rank
+
+		if rank[sa[-1]] == n - 1 or step >= n:
+			break
+		step *= 2
+
+	return sa.astype(np.int32 if n < 2**31 else np.int64)
+
+#1.5.2
+class GenomeIndex:
+	"""
+		FM-index of a genome (suffix array plus the occurrence table of its
+		Burrows-Wheeler transform). It is built once and then answers exact
+		pattern queries in time proportional to the pattern length (plus the
+		number of hits when positions are requested), regardless of the genome size.
+
+		Parameters
+		---
+			genome : str
+				The genome string (str or bytes-like) to index.
+	"""
+
+	def __init__(self, genome : str):
+		buffer = _as_array(genome)
+		self.length = len(buffer)
+		self.sa = suffix_array(buffer)
+
+		# symbols are numbered from 1 in byte order, 0 is the sentinel
+		alphabet = np.unique(buffer)
+		self._symbols = np.full(256, -1, dtype=np.int16)
+		self._symbols[alphabet] = np.arange(1, len(alphabet) + 1)
+
+		bwt = np.zeros(self.length + 1, dtype=np.int16)
+		previous = self.sa.astype(np.int64) - 1
+		has_previous = previous >= 0
+		bwt[has_previous] = self._symbols[buffer[previous[has_previous]]]
+
+		symbol_count = len(alphabet) + 1
+		self._occ = np.zeros((symbol_count, self.length + 2), dtype=np.int32)
+		for symbol in range(symbol_count):
+			np.cumsum(bwt == symbol, out=self._occ[symbol, 1:])
+		self._first = np.concatenate(([0], np.cumsum(self._occ[:, -1])[:-1]))
+
+	def _interval(self, pattern : str) -> range:
+		"""
+			Finds the suffix array interval whose suffixes start with pattern
+			using FM-index backward search.
+		"""
+		if isinstance(pattern, str):
+			pattern = pattern.encode("ascii")
+		low, high = 0, self.length + 1
+
+		for char in reversed(bytes(pattern)):
+			symbol = self._symbols[char]
+			if symbol < 0:
+				return range(0)
+			low = int(self._first[symbol] + self._occ[symbol, low])
+			high = int(self._first[symbol] + self._occ[symbol, high])
+			if low >= high:
+				return range(0)
+
+		return range(low, high)
+
+	def count(self, pattern : str) -> int:
+		"""
+			Counts the times the given pattern is present in the indexed genome.
+
+			Parameters
+			---
+				pattern : str
+					The pattern to search for.
+
+			Returns
+			---
+				int : How many times pattern is present in the genome.
+		"""
+		return len(self._interval(pattern))
+
+	def positions(self, pattern : str) -> List[int]:
+		"""
+			Returns the positions in the indexed genome where pattern starts.
+
+			Parameters
+			---
+				pattern : str
+					The pattern to find.
+
+			Returns
+			---
+				List[int] : Sorted list of all positions where pattern starts.
+		"""
+		interval = self._interval(pattern)
+		return np.sort(self.sa[interval.start:interval.stop]).tolist()
+
+#1.6.1
+_NUCLEOTIDE_CODES = np.full(256, 4, dtype=np.uint8)
+_NUCLEOTIDE_CODES[np.frombuffer(b"ACGT", dtype=np.uint8)] = np.arange(4, dtype=np.uint8)
+_NUCLEOTIDES = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+# k-mers up to this length are counted in a dense array of 4^k counters,
+# longer ones in a sorted table of the k-mers that are actually present
+_DENSE_MAX_K = 10
+
+_BLOCK_SIZE = 1 << 18
+
+def encode(text : str) -> np.ndarray:
+	"""
+		Encodes a nucleotide string as an array of 2-bit codes
+		(A = 0, C = 1, G = 2, T = 3). Any other symbol is encoded as 4.
+
+		Parameters
+		---
+			text : str
+				Nucleotide string (str, bytes or any bytes-like object).
+
+		Returns
+		---
+			np.ndarray : uint8 array with the code of each nucleotide.
+	"""
+	return _NUCLEOTIDE_CODES[_as_array(text)]
+
+#1.6.2
+def kmer_codes(text : str, k : int, circular : bool = False) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+		Packs every k-mer of text into an integer, two bits per nucleotide,
+		with a rolling shift instead of slicing the text.
+
+		Parameters
+		---
+			text : str
+				Nucleotide string (str, bytes or any bytes-like object).
+			k : int
+				Length of the k-mers, at most 32.
+			circular : bool
+				Treat text as a circular genome, so the k-mers that wrap around
+				its end are included (default False).
+
+		Returns
+		---
+			Tuple[np.ndarray, np.ndarray] : Array with the code of the k-mer starting
+				at each position (uint32 for k <= 16, uint64 otherwise), and a boolean
+				array telling which of those k-mers contain only ACGT (the others
+				have meaningless codes).
+	"""
+	codes = encode(text)
+	return _pack_codes(_circular(codes, k) if circular else codes, k)
+
+def _pack_codes(codes : np.ndarray, k : int) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+		Packed k-mers of an array of nucleotide codes, see kmer_codes.
+	"""
+	if k > 32:
+		raise ValueError("k-mers longer than 32 don't fit in 64 bits")
+
+	windows = len(codes) - k + 1
+	code_type = np.uint32 if k <= 16 else np.uint64
+	if windows <= 0:
+		return np.zeros(0, dtype=code_type), np.zeros(0, dtype=bool)
+
+	invalid = codes > 3
+	if invalid.any():
+		invalid_count = np.concatenate(([0], np.cumsum(invalid, dtype=np.int32)))
+		valid = invalid_count[k:k + windows] == invalid_count[:windows]
+		codes = codes & 3
+	else:
+		valid = np.ones(windows, dtype=bool)
+
+	result = np.zeros(windows, dtype=code_type)
+	for j in range(k):
+		result <<= code_type(2)
+		result |= codes[j:j + windows]
+
+	return result, valid
+
+def _circular(text, k : int):
+	"""
+		Appends to text (a string or an array) its first k - 1 symbols, so the
+		k-mers of a circular genome that wrap around its end can be read linearly.
+	"""
+	if not 1 < k <= len(text):
+		return text
+	if isinstance(text, np.ndarray):
+		return np.concatenate((text, text[:k - 1]))
+	return text + text[:k - 1]
+
+#1.6.3
+def decode_kmers(codes : np.ndarray, k : int) -> List[str]:
+	"""
+		Turns packed k-mer codes back into nucleotide strings.
+
+		Parameters
+		---
+			codes : np.ndarray
+				Array of k-mer codes as returned by kmer_codes.
+			k : int
+				Length of the k-mers.
+
+		Returns
+		---
+			List[str] : The k-mer string of each code.
+	"""
+	codes = np.asarray(codes, dtype=np.uint64)
+	if k == 0:
+		return [""] * len(codes)
+
+	shifts = np.arange(2 * (k - 1), -1, -2, dtype=np.uint64)
+	letters = _NUCLEOTIDES[(codes[:, None] >> shifts) & np.uint64(3)]
+	return [kmer.decode("ascii") for kmer in np.ascontiguousarray(letters).view("S%d" % k).ravel()]
+
+#1.6.4
+def count_kmers(text : str, k : int) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+		Counts the k-mers of text on their packed integer codes, using a dense
+		array of 4^k counters for small k and a sorted table of the k-mers
+		present for larger k. Windows with symbols other than ACGT are skipped.
+
+		Parameters
+		---
+			text : str
+				Nucleotide string (str, bytes or any bytes-like object).
+			k : int
+				Length of the k-mers, at most 32.
+
+		Returns
+		---
+			Tuple[np.ndarray, np.ndarray] : The codes of the distinct k-mers in
+				increasing order and how many times each one is present.
+	"""
+	codes, valid = kmer_codes(text, k)
+	if not valid.all():
+		codes = codes[valid]
+	return _count_codes(codes, k)
+
+#1.6.5
+def reverse_complement_codes(codes : np.ndarray, k : int) -> np.ndarray:
+	"""
+		Packed codes of the reverse complements of packed k-mers. With A, C, G, T
+		coded as 0 to 3 the complement of a nucleotide is 3 minus its code, so
+		the k-mer is complemented with a XOR and its 2-bit groups reversed.
+
+		Parameters
+		---
+			codes : np.ndarray
+				Array of k-mer codes as returned by kmer_codes.
+			k : int
+				Length of the k-mers.
+
+		Returns
+		---
+			np.ndarray : uint64 array with the code of the reverse complement of each k-mer.
+	"""
+	codes = np.asarray(codes, dtype=np.uint64) ^ np.uint64((1 << 2 * k) - 1)
+	result = np.zeros(codes.shape, dtype=np.uint64)
+
+	for _ in range(k):
+		result = (result << np.uint64(2)) | (codes & np.uint64(3))
+		codes = codes >> np.uint64(2)
+
+	return result
+
+def _count_codes(codes : np.ndarray, k : int) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+		Counts packed k-mer codes, see count_kmers.
+	"""
+	if k <= _DENSE_MAX_K:
+		# bincount casts its input to intp, so it's fed in blocks to keep that copy small
+		counts = np.zeros(4**k, dtype=np.int64)
+		for start in range(0, len(codes), _BLOCK_SIZE):
+			counts += np.bincount(codes[start:start + _BLOCK_SIZE], minlength=4**k)
+		kmers = np.flatnonzero(counts)
+		return kmers.astype(codes.dtype), counts[kmers]
+
+	codes = np.sort(codes)
+	starts = np.flatnonzero(np.concatenate(([len(codes) > 0], codes[1:] != codes[:-1])))
+	counts = np.diff(np.append(starts, len(codes)))
+	return codes[starts], counts
+
+def _split_windows(text : str, k : int, circular : bool = False) -> Tuple[np.ndarray, np.ndarray, Dict[str, list]]:
+	"""
+		Splits the k-mers of text (k at most 32) into the ones with only ACGT,
+		packed, and the others, which are counted as strings. Returns the packed
+		codes with the position of each one in text (None if every k-mer was
+		packed), and a dictionary from each other k-mer to its first position
+		and count, in order of first appearance.
+	"""
+	codes, valid = kmer_codes(text, k, circular)
+	if valid.all():
+		return codes, None, {}
+
+	positions = np.flatnonzero(valid)
+	text = _as_str(text)
+	if circular:
+		text = _circular(text, k)
+
+	others = {}
+	for i in np.flatnonzero(~valid).tolist():
+		kmer = text[i:i+k]
+		if kmer in others:
+			others[kmer][1] += 1
+		else:
+			others[kmer] = [i, 1]
+
+	return codes[positions], positions, others
+
+def _first_positions(codes : np.ndarray, kmers : np.ndarray) -> np.ndarray:
+	"""
+		Position of the first appearance in codes of each of the sorted kmers,
+		all of which must be present in codes.
+	"""
+	if len(kmers) <= 64:
+		return np.array([np.argmax(codes == kmer) for kmer in kmers], dtype=np.int64)
+
+	first = np.full(len(kmers), len(codes), dtype=np.int64)
+	np.minimum.at(first, np.searchsorted(kmers, codes), np.arange(len(codes)))
+	return first
+
+def _as_array(text : str) -> np.ndarray:
+	"""
+		Returns the bytes of text as a uint8 array, without copying them
+		if text is already a bytes-like object.
+	"""
+	if isinstance(text, str):
+		text = text.encode("latin-1")
+	return np.frombuffer(text, dtype=np.uint8)
+
+def _as_str(text : str) -> str:
+	"""
+		Returns text as a str, decoding it if it is a bytes-like object.
+	"""
+	if isinstance(text, str):
+		return text
+	return bytes(text).decode("latin-1")
+
+def _match_positions(text : str, pattern : str, circular : bool = False) -> np.ndarray:
+	"""
+		Positions where pattern starts in text. Patterns of up to 32 nucleotides
+		are matched on the packed k-mers of text, other ones with _find_all.
+	"""
+	pattern_codes = encode(pattern)
+	pattern_len = len(pattern_codes)
+
+	if 0 < pattern_len <= 32 and (pattern_codes < 4).all():
+		codes, valid = kmer_codes(text, pattern_len, circular)
+		pattern_code = _pack_codes(pattern_codes, pattern_len)[0][0]
+		return np.flatnonzero((codes == pattern_code) & valid)
+
+	text_len = len(text)
+	if circular:
+		text = _circular(text if isinstance(text, str) else bytes(text), pattern_len)
+
+	positions = np.fromiter(_find_all(text, pattern), dtype=np.int64)
+	return positions[positions < text_len] if circular else positions
+
+def _find_all(text : str, pattern : str) -> Iterator[int]:
+	"""
+		Positions where pattern starts in text, overlapping matches included.
+		Bytes-like texts, such as memory-mapped genomes, are searched in place.
+	"""
+	if isinstance(text, str):
+		expression = "(?=" + re.escape(_as_str(pattern)) + ")"
+	else:
+		if isinstance(pattern, str):
+			pattern = pattern.encode("latin-1")
+		expression = b"(?=" + re.escape(bytes(pattern)) + b")"
+
+	return (match.start() for match in re.finditer(expression, text))
+
+def _string_pattern_count_kmer(text : str, k : int, top_n : int = None):
+	"""
+		Single pass pattern_count_kmer on string slices, for texts that have
+		symbols other than ACGT or k-mers too long to be packed.
+	"""
+	first = {}
+	counts = {}
+
+	for i in range(len(text) - k + 1):
+		mer = text[i:i+k]
+		if mer not in first:
+			first[mer] = i
+			counts[mer] = 1
+		elif i >= first[mer] + k:
+			counts[mer] += 1
+
+	top = heapq.nsmallest(1 if top_n is None else top_n, ((-counts[mer], first[mer], mer) for mer in counts))
+
+	if top_n is None:
+		return top[0][2] if top else ''
+	return [(mer, -count) for count, _, mer in top]
+
+def _string_frequency_map(text : str, k : int) -> Dict[str, int]:
+	"""
+		Frequency map of text built on string slices, for texts that
+		have symbols other than ACGT.
+	"""
+	freq_map = {}
+
+	for i in range(len(text) - k + 1):
+		pattern = text[i:i+k]
+		if (pattern in freq_map):
+			freq_map[pattern] += 1
+		else:
+			freq_map[pattern] = 1
+
+	return freq_map
+
+def _check_pattern_matching(rng):
+	# the index and the packed search against slicing, with patterns up to 40
+	# nucleotides so the uint64 codes (k > 16) and the unpacked case (k > 32)
+	# are searched too
+	for trial in range(200):
+		text = "".join(rng.choice("ACGT" if trial % 4 else "ACGTN") for _ in range(rng.randint(1, 80)))
+		k = rng.randint(1, 6) if trial % 3 else rng.randint(17, 40)
+		start = rng.randrange(len(text))
+		pattern = text[start:start + k] if trial % 2 else "".join(rng.choice("ACGT") for _ in range(k))
+		positions = [i for i in range(len(text) - len(pattern) + 1) if text[i:i + len(pattern)] == pattern]
+		circular_text = text + text[:len(pattern) - 1]
+		circular_positions = [i for i in range(len(text)) if circular_text[i:i + len(pattern)] == pattern]
+		index = GenomeIndex(text)
+
+		assert suffix_array(text).tolist() == sorted(range(len(text) + 1), key=lambda i: text[i:])
+		assert index.positions(pattern) == positions
+		assert index.count(pattern) == len(positions)
+		assert pattern_match_positions(pattern, text) == positions
+		assert pattern_match_positions(pattern, text, index) == positions
+		assert pattern_match_positions(pattern, text.encode()) == positions
+		assert pattern_match_positions(pattern, text, circular=True) == circular_positions
+		assert pattern_count(text, pattern) == len(positions)
+		assert pattern_count(text, pattern, circular=True) == len(circular_positions)
+
+def _check_kmer_counting(rng):
+	# the packed counts against string slicing, with texts full of N so the
+	# packed and string k-mers are merged, and k-mers long enough to be packed
+	# in uint64 (k > 16) or not packed at all (k > 32)
+	for trial in range(200):
+		text = "".join(rng.choice("ACGT" if trial % 4 else "ACGTN") for _ in range(rng.randint(1, 80)))
+		k = rng.randint(1, 6) if trial % 3 else rng.randint(17, 40)
+		kmers = [text[i:i + k] for i in range(len(text) - k + 1)]
+		freq_map = _string_frequency_map(text, k)
+		circular_map = _string_frequency_map(_circular(text, k), k)
+
+		assert frequency_map(text, k) == freq_map
+		assert list(frequency_map(text, k)) == list(dict.fromkeys(kmers))
+		assert frequency_map(text.encode(), k) == freq_map
+		assert frequency_map(text, k, circular=True) == circular_map
+		assert list(frequency_map(text, k, circular=True)) == list(circular_map)
+		for words, counts in ((frequent_words(text, k), freq_map), (frequent_words(text, k, circular=True), circular_map)):
+			most_freq = max(counts.values(), default=0)
+			assert words == [kmer for kmer in counts if counts[kmer] == most_freq]
+		if k <= 32:
+			codes, counts = count_kmers(text, k)
+			assert dict(zip(decode_kmers(codes, k), counts.tolist())) == {kmer : count for kmer, count in freq_map.items() if "N" not in kmer}
+
+def _check_pattern_count_kmer(rng):
+	# the packed single pass against the string one, ties and overlaps included
+	for trial in range(200):
+		text = "".join(rng.choice("ACGT" if trial % 4 else "ACGTN") for _ in range(rng.randint(1, 80)))
+		k = rng.randint(1, 6) if trial % 3 else rng.randint(17, 40)
+		assert pattern_count_kmer(text, k) == _string_pattern_count_kmer(text, k)
+		assert pattern_count_kmer(text, k, 3) == _string_pattern_count_kmer(text, k, 3)
+
+def _check_clumps(rng):
+	# the sliding counts against counting every window on its own
+	for trial in range(200):
+		text = "".join(rng.choice("ACGT" if trial % 4 else "ACGTN") for _ in range(rng.randint(1, 80)))
+		k = rng.randint(1, 4) if trial % 3 else rng.randint(17, 40)
+		L, t = rng.randint(k, k + 30), rng.randint(1, 3)
+		kmers = [text[i:i + k] for i in range(len(text) - k + 1)]
+		clumps = {}
+		for window in range(len(text) - L + 1):
+			window_kmers = kmers[window:window + L - k + 1]
+			for kmer in window_kmers:
+				if window_kmers.count(kmer) >= t and window not in clumps.get(kmer, []):
+					clumps.setdefault(kmer, []).append(window)
+		assert find_clumps(text, k, L, t) == clumps
+
+def _check_reverse_complements(rng):
+	# the translation tables and the backwards stream against complementing
+	# symbol by symbol, the symbols other than ACGT are left as they are
+	for trial in range(200):
+		text = "".join(rng.choice("ACGT" if trial % 4 else "ACGTN") for _ in range(rng.randint(1, 80)))
+		expected = "".join({"A": "T", "C": "G", "G": "C", "T": "A"}.get(c, c) for c in reversed(text))
+		assert reverse_complement(text) == expected
+		assert reverse_complement(text.encode()) == expected.encode()
+		assert reverse_complement(memoryview(text.encode())) == expected.encode()
+		assert complement(bytearray(text.encode())) == expected[::-1].encode()
+
+	genome = "".join(rng.choice("ACGT") for _ in range(5000))
+	lines = "\n".join(genome[i:i + 70] for i in range(0, len(genome), 70))
+	for chunk_size in (1, 64, 1 << 20):
+		chunks = reverse_complement_chunks(io.BytesIO(lines.encode()), chunk_size)
+		assert b"".join(chunks).decode() == reverse_complement(genome)
+
+def _check_kmer_codes(rng):
+	# the rolling packed codes, linear and circular, against the k-mers sliced
+	# from the text, up to the 32 nucleotides that fit in a uint64
+	for trial in range(200):
+		text = "".join(rng.choice("ACGT" if trial % 4 else "ACGTN") for _ in range(rng.randint(1, 80)))
+		k = rng.randint(1, 6) if trial % 3 else rng.randint(17, 32)
+		for circular in (False, True):
+			sliced = _circular(text, k) if circular else text
+			kmers = [sliced[i:i + k] for i in range(len(sliced) - k + 1)]
+			codes, valid = kmer_codes(text, k, circular)
+			assert codes.dtype == (np.uint32 if k <= 16 else np.uint64)
+			assert valid.tolist() == ["N" not in kmer for kmer in kmers]
+			assert [kmer for kmer, ok in zip(decode_kmers(codes, k), valid) if ok] == [kmer for kmer in kmers if "N" not in kmer]
+			assert decode_kmers(reverse_complement_codes(codes[valid], k), k) == [reverse_complement(kmer) for kmer in kmers if "N" not in kmer]
+
+def test_functions():
+	# the indexed, packed and streamed functions against the plain string
+	# definitions, on random texts (some with symbols other than ACGT)
+	rng = random.Random(0)
+	_check_pattern_matching(rng)
+	_check_kmer_counting(rng)
+	_check_pattern_count_kmer(rng)
+	_check_clumps(rng)
+	_check_reverse_complements(rng)
+	_check_kmer_codes(rng)
+	print("mod1 checks passed")
+
+if __name__ == '__main__':
+	test_functions()
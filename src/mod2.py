@@ -1,6 +1,11 @@
+import io
 import os
-from typing import Dict, List
-from mod1 import pattern_count
+import random
+from itertools import combinations, product
+from typing import Dict, List, Tuple
+import numpy as np
+from mod1 import pattern_count, count_kmers, decode_kmers, encode, kmer_codes, reverse_complement, reverse_complement_codes, _as_array, _as_str
+from genome import iter_genome_chunks, load_genome
 
 
 #2.1
@@ -18,6 +23,7 @@ def symbol_array(genome : str, symbol : str) -> List[str]:
         ---
             List[str] : List of all positions where the symbol appears in the genome.
     """
+    genome = _as_str(genome)
 
     result = {}
     window_size = len(genome) // 2
@@ -45,6 +51,7 @@ def improved_symbol_array(genome : str, symbol : str) -> List[str]:
         ---
             List[str] : List of all positions where the symbol appears in the genome.
     """
+    genome = _as_str(genome)
     result = {}
     window_size = len(genome) // 2
     extended_genome = genome + genome[0:window_size]
@@ -61,36 +68,68 @@ def improved_symbol_array(genome : str, symbol : str) -> List[str]:
     
     return result
 
-#2.4.1
-def skew_array(genome : str) -> List[int]:
+#2.1.2
+def symbol_arrays(genome : str, symbols : str = "ACGT", step : int = 1) -> Dict[str, np.ndarray]:
     """
-        Finds the skew array of the genome (string). The Skew array
-        is an array where skew[i] = (ocurrences of G) - (ocurrences of C), 
-        skew[0] is always 0. 
+        Counts each symbol in every half-genome window of the circular genome,
+        like improved_symbol_array, from a prefix sum of the symbol occurrences
+        instead of a dictionary entry per position.
 
         Parameters
         ---
             genome : str
-                the genome string to generate the skew array from.
-        
+                The genome string (str, bytes or any bytes-like object) to search in.
+            symbols : str
+                The symbols to count, one character each (default "ACGT").
+            step : int
+                Only keep the windows starting at every step-th position, e.g. to
+                plot a large genome (default 1, all the windows).
+
         Returns
         ---
-            List[int] : Skew array with the counts of # of G's minus # of C's.
+            Dict[str, np.ndarray] : For each symbol, an int32 array whose i-th value is
+                the count of the symbol in the window starting at position i * step.
     """
+    buffer = _as_array(genome)
+    genome_len = len(buffer)
+    window_size = genome_len // 2
+    starts = np.arange(0, genome_len, step)
+    ends = starts + window_size
 
-    result = [0]
-    genome_len = len(genome)
+    # windows that run past the end of the genome wrap around to its start
+    inside_ends = np.minimum(ends, genome_len)
+    wrapped_ends = np.maximum(ends - genome_len, 0)
 
-    for i in range (genome_len):
+    result = {}
+    for symbol in symbols:
+        prefix = np.zeros(genome_len + 1, dtype=np.int32)
+        np.cumsum(buffer == ord(symbol), dtype=np.int32, out=prefix[1:])
+        result[symbol] = prefix[inside_ends] - prefix[starts] + prefix[wrapped_ends]
 
-        if genome[i] == "A" or genome[i] == "T":
-            result.append(result[i])
-        
-        if genome[i] == "G":
-            result.append(result[i] + 1)
+    return result
+
+#2.4.1
+# skew step of each nucleotide code from mod1.encode (A, C, G, T, other)
+_SKEW_STEPS = np.array([0, -1, 1, 0, 0], dtype=np.int8)
+
+def skew_array(genome : str) -> np.ndarray:
+    """
+        Finds the skew array of the genome (string). The Skew array
+        is an array where skew[i] = (ocurrences of G) - (ocurrences of C), 
+        skew[0] is always 0. Symbols other than ACGT don't change the skew.
+
+        Parameters
+        ---
+            genome : str
+                the genome string (str, bytes or any bytes-like object) to generate 
+                the skew array from.
         
-        if genome[i] == "C":
-            result.append(result[i] - 1)
+        Returns
+        ---
+            np.ndarray : int32 skew array with the counts of # of G's minus # of C's.
+    """
+    result = np.zeros(len(genome) + 1, dtype=np.int32)
+    np.cumsum(_SKEW_STEPS[encode(genome)], dtype=np.int32, out=result[1:])
     
     return result
     
@@ -102,7 +141,7 @@ def minimum_skew(genome : str) -> List[int]:
         Parameters
         ---
             genome : str
-                A DNA string.
+                A DNA string (str, bytes or any bytes-like object).
             
         Returns
         ---
@@ -110,8 +149,47 @@ def minimum_skew(genome : str) -> List[int]:
     """
 
     skew_arr = skew_array(genome)
-    skew_min = min(skew_arr)
-    return [ index for index, value in enumerate(skew_arr) if value == skew_min ]
+    return np.flatnonzero(skew_arr == skew_arr.min()).tolist()
+
+#2.4.3
+def minimum_skew_file(genome_file, chunk_size : int = 1 << 20) -> List[int]:
+    """
+        Finds the positions where the skew diagram of a genome file attains a
+        minimum, reading it chunk by chunk and keeping only the running minimum
+        and its positions, so the genome never has to fit in memory.
+
+        Parameters
+        ---
+            genome_file : str
+                Path of a plain text or FASTA genome file, or a file opened in binary mode.
+            chunk_size : int
+                Bytes read per chunk (default 1 MiB).
+
+        Returns
+        ---
+            List[int] : All the positions in the genome where skew is minimum.
+    """
+    skew_min = 0
+    positions = [0]
+    skew = 0
+    offset = 0
+
+    for chunk in iter_genome_chunks(genome_file, chunk_size):
+        chunk_skew = np.cumsum(_SKEW_STEPS[encode(chunk)], dtype=np.int64) + skew
+        chunk_min = int(chunk_skew.min())
+
+        if chunk_min <= skew_min:
+            chunk_positions = (np.flatnonzero(chunk_skew == chunk_min) + offset + 1).tolist()
+            if chunk_min < skew_min:
+                skew_min = chunk_min
+                positions = chunk_positions
+            else:
+                positions.extend(chunk_positions)
+
+        skew = int(chunk_skew[-1])
+        offset += len(chunk)
+
+    return positions
 
 #2.5.1
 def hamming_distance(p : str, q : str) -> int:
@@ -148,7 +226,7 @@ def aprox_pattern_matching(genome : str, pattern : str, d : int) -> List[int]:
         Parameters
         ---
             genome : str
-                The genome string to search in.
+                The genome string (str, bytes or any bytes-like object) to search in.
             pattern : str
                 The pattern string to search for.
             d : int
@@ -160,18 +238,7 @@ def aprox_pattern_matching(genome : str, pattern : str, d : int) -> List[int]:
             List[int] : Starting positions where pattern is a substring of genome
                 with maximum d mismatches.
     """
-    pattern_len = len(pattern)
-    mismatch_count = 0
-    positions = []
-
-    for i in range(len(genome) - pattern_len + 1):
-        
-        mismatch_count = hamming_distance(genome[i : i + pattern_len], pattern)
-        
-        if mismatch_count <= d:
-            positions.append(i)
-
-    return positions
+    return aprox_pattern_positions(genome, pattern, d).tolist()
 
 #2.5.3
 def aprox_pattern_count(genome : str, pattern : str, d : int) -> int:
@@ -181,7 +248,7 @@ def aprox_pattern_count(genome : str, pattern : str, d : int) -> int:
         Parameters
         ---
             genome : str
-                The genome string to search in.
+                The genome string (str, bytes or any bytes-like object) to search in.
             pattern : str
                 The pattern string to search for.
             d : int
@@ -193,34 +260,440 @@ def aprox_pattern_count(genome : str, pattern : str, d : int) -> int:
             int : The amount of times the given pattern is present in the genome
                 with maximum d mismatches.
     """
-    pattern_len = len(pattern)
-    mismatch_count = 0
-    count = 0
+    return len(aprox_pattern_positions(genome, pattern, d))
 
-    for i in range(len(genome) - pattern_len + 1):
-        
-        mismatch_count = hamming_distance(genome[i : i + pattern_len], pattern)
-        
-        if mismatch_count <= d:
-            count += 1
+#2.5.4
+# masks the low bit of every 2-bit nucleotide of a packed k-mer
+_LOW_BITS = np.uint64(0x5555555555555555)
+
+def aprox_pattern_positions(genome : str, pattern : str, d : int) -> np.ndarray:
+    """
+        Finds the starting positions of the approximate occurrences of a pattern
+        in a genome in a single bit-parallel pass. Every window is packed two bits
+        per nucleotide, XORed with the packed pattern and the differing nucleotides
+        are counted with a popcount, without building any substring.
+
+        Parameters
+        ---
+            genome : str
+                The genome string (str, bytes or any bytes-like object) to search in.
+            pattern : str
+                The pattern string to search for.
+            d : int
+                The maximum number of mismatches allowed.
 
-    return count    
+        Returns
+        ---
+            np.ndarray : Starting positions where pattern is a substring of genome
+                with maximum d mismatches, in increasing order.
+    """
+    return np.flatnonzero(_window_mismatches(genome, pattern) <= d)
+
+#2.5.5
+def aprox_patterns_matching(genome : str, patterns : List[str], d : int) -> Dict[str, List[int]]:
+    """
+        Finds the approximate occurrences of many patterns in a single scan of
+        the genome. Each pattern is split into d + 1 pieces, one of which has to
+        match exactly in any occurrence with at most d mismatches (pigeonhole
+        principle), so the genome is scanned once for the seeds of every piece
+        and only the windows around seed hits are verified.
+
+        Parameters
+        ---
+            genome : str
+                The genome string (str, bytes or any bytes-like object) to search in.
+            patterns : List[str]
+                The pattern strings to search for.
+            d : int
+                The maximum number of mismatches allowed.
+
+        Returns
+        ---
+            Dict[str, List[int]] : Starting positions of the approximate occurrences
+                of each pattern, in increasing order.
+    """
+    patterns = [_as_str(pattern) for pattern in patterns]
+    if d < 0 or not patterns:
+        return {pattern : [] for pattern in patterns}
+
+    # every piece is at least seed_len long, so its prefix of that length is the seed
+    seed_len = min(32, min(len(pattern) // (d + 1) for pattern in patterns))
+    if seed_len == 0 or any((encode(pattern) > 3).any() for pattern in patterns):
+        return {pattern : aprox_pattern_matching(genome, pattern, d) for pattern in patterns}
+
+    codes, valid = kmer_codes(genome, seed_len)
+    seeds = {}
+    for pattern in patterns:
+        for i in range(d + 1):
+            offset = i * len(pattern) // (d + 1)
+            # kept as a numpy integer of the codes' dtype, codes of seeds longer
+            # than 26 nucleotides don't survive a conversion to float64
+            seed_code = kmer_codes(pattern[offset:offset + seed_len], seed_len)[0][0]
+            seeds.setdefault(pattern, []).append((seed_code, offset))
+
+    seed_codes = np.unique(np.array([code for entries in seeds.values() for code, _ in entries], dtype=codes.dtype))
+    hits = np.flatnonzero(np.isin(codes, seed_codes) & valid)
+    hits = hits[np.argsort(codes[hits], kind="stable")]
+    hit_codes = codes[hits]
+
+    buffer = _as_array(genome)
+    result = {}
+    for pattern, entries in seeds.items():
+        candidates = []
+        for seed_code, offset in entries:
+            low = np.searchsorted(hit_codes, seed_code, side="left")
+            high = np.searchsorted(hit_codes, seed_code, side="right")
+            candidates.append(hits[low:high] - offset)
+
+        starts = np.unique(np.concatenate(candidates))
+        starts = starts[(starts >= 0) & (starts <= len(buffer) - len(pattern))]
+        mismatches = _column_mismatches(buffer, _as_array(pattern), starts)
+        result[pattern] = starts[mismatches <= d].tolist()
+
+    return result
+
+#2.6.1
+def mismatch_counts(text : str, k : int, d : int, reverse_complements : bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Counts, for every k-mer within d mismatches of some k-mer of text, how many
+        k-mers of text are within d mismatches of it (its approximate count). The
+        d-neighborhood of each distinct k-mer of text is generated by XORing its
+        packed code with every mismatch mask, and its count is added to all of
+        them. Windows with symbols other than ACGT are skipped.
+
+        Parameters
+        ---
+            text : str
+                Nucleotide string (str, bytes or any bytes-like object).
+            k : int
+                Length of the k-mers, at most 32.
+            d : int
+                The maximum number of mismatches allowed.
+            reverse_complements : bool
+                Add to the count of each k-mer the count of its reverse complement.
+                The neighborhoods are only generated for one strand, the other
+                strand is read back from them (default False).
+
+        Returns
+        ---
+            Tuple[np.ndarray, np.ndarray] : Packed codes of the k-mers in increasing
+                order, and the approximate count of each one.
+    """
+    kmers, counts = count_kmers(text, k)
+    kmers = kmers.astype(np.uint64)
+    masks = _mismatch_masks(k, d)
+
+    if 4**k <= len(kmers) * len(masks):
+        totals = np.zeros(4**k, dtype=np.int64)
+        for mask in masks:
+            # XOR with a fixed mask is a bijection, so no index is repeated
+            totals[(kmers ^ mask).astype(np.intp)] += counts
+        codes = np.flatnonzero(totals).astype(np.uint64)
+        totals = totals[codes]
+    else:
+        codes = np.concatenate([kmers ^ mask for mask in masks])
+        codes, inverse = np.unique(codes, return_inverse=True)
+        totals = np.bincount(inverse, weights=np.tile(counts, len(masks))).astype(np.int64)
+
+    if reverse_complements:
+        both_strands = np.union1d(codes, reverse_complement_codes(codes, k))
+        totals = _lookup_counts(both_strands, codes, totals) + \
+            _lookup_counts(reverse_complement_codes(both_strands, k), codes, totals)
+        codes = both_strands
+
+    return codes, totals
+
+#2.6.2
+def frequent_words_with_mismatches(text : str, k : int, d : int, reverse_complements : bool = False) -> List[str]:
+    """
+        Finds the most frequent k-mers with up to d mismatches in text, which
+        don't need to appear in text themselves.
+
+        Parameters
+        ---
+            text : str
+                Nucleotide string (str, bytes or any bytes-like object).
+            k : int
+                Length of the k-mers, at most 32.
+            d : int
+                The maximum number of mismatches allowed.
+            reverse_complements : bool
+                Count the approximate occurrences of the reverse complement of each
+                k-mer too (default False).
+
+        Returns
+        ---
+            List[str] : The most frequent k-mers, in lexicographic order.
+    """
+    codes, totals = mismatch_counts(text, k, d, reverse_complements)
+    if len(codes) == 0:
+        return []
+
+    return decode_kmers(codes[totals == totals.max()], k)
+
+#2.7.1
+def find_ori(genome : str, window : int = 500, k : int = 9, d : int = 1, top : int = 10) -> dict:
+    """
+        Looks for candidate DnaA boxes around the replication origin. The genome
+        is read once to find the minimum skew, and the most frequent k-mers with
+        up to d mismatches (counting both strands) are searched in a window
+        centered on it. The window is a view of the genome when it is a bytes-like
+        object, and a copy of just the window when it is a str or when the window
+        wraps around the end of the (circular) genome.
+
+        Parameters
+        ---
+            genome : str
+                The genome (str, bytes or any bytes-like object).
+            window : int
+                Length of the window around the minimum skew (default 500).
+            k : int
+                Length of the DnaA boxes, at most 32 (default 9).
+            d : int
+                The maximum number of mismatches allowed (default 1).
+            top : int
+                Number of candidates to return (default 10).
+
+        Returns
+        ---
+            dict : The first position where the skew is minimum ("minimum_skew"),
+                the window start and end ("window", the end may be past the end of
+                the genome if the window wraps around) and the candidates, most
+                frequent first ("candidates"). Each candidate has its k-mer (the
+                lexicographically smaller of the k-mer and its reverse complement),
+                its reverse complement, its approximate count on both strands, and
+                the genome positions of the windows within d mismatches of the k-mer
+                ("forward") and of its reverse complement ("reverse").
+    """
+    genome_len = len(genome)
+    skew_minimum = int(skew_array(genome).argmin())
+
+    window = min(window, genome_len)
+    start = skew_minimum - window // 2
+    stop = start + window
+    if start < 0:
+        start, stop = start + genome_len, stop + genome_len
+
+    sequence = genome if isinstance(genome, str) else _as_array(genome)
+    if stop <= genome_len:
+        window_sequence = sequence[start:stop]
+    elif isinstance(sequence, str):
+        window_sequence = sequence[start:] + sequence[:stop - genome_len]
+    else:
+        window_sequence = np.concatenate((sequence[start:], sequence[:stop - genome_len]))
+
+    codes, totals = mismatch_counts(window_sequence, k, d, True)
+    # each k-mer has the same count as its reverse complement, only one is kept
+    canonical = codes <= reverse_complement_codes(codes, k)
+    codes, totals = codes[canonical], totals[canonical]
+    ranking = np.lexsort((codes, -totals))[:top]
+
+    candidates = []
+    for kmer, total in zip(decode_kmers(codes[ranking], k), totals[ranking].tolist()):
+        kmer_complement = reverse_complement(kmer)
+        candidates.append({
+            "kmer": kmer,
+            "reverse_complement": kmer_complement,
+            "count": total,
+            "forward": ((np.flatnonzero(_window_mismatches(window_sequence, kmer) <= d) + start) % genome_len).tolist(),
+            "reverse": ((np.flatnonzero(_window_mismatches(window_sequence, kmer_complement) <= d) + start) % genome_len).tolist(),
+        })
+
+    return {"minimum_skew": skew_minimum, "window": [start, stop], "candidates": candidates}
+
+def _lookup_counts(queries : np.ndarray, codes : np.ndarray, counts : np.ndarray) -> np.ndarray:
+    """
+        Count of each query code in the sorted codes table, 0 if it isn't there.
+    """
+    if len(codes) == 0:
+        return np.zeros(len(queries), dtype=np.int64)
+
+    index = np.minimum(np.searchsorted(codes, queries), len(codes) - 1)
+    return np.where(codes[index] == queries, counts[index], 0)
+
+def _mismatch_masks(k : int, d : int) -> np.ndarray:
+    """
+        XOR masks turning a packed k-mer into each k-mer at Hamming distance at
+        most d from it, each neighbor exactly once.
+    """
+    masks = []
+    for distance in range(min(d, k) + 1):
+        for positions in combinations(range(k), distance):
+            for changes in product((1, 2, 3), repeat=distance):
+                mask = 0
+                for position, change in zip(positions, changes):
+                    mask |= change << 2 * (k - 1 - position)
+                masks.append(mask)
+    return np.array(masks, dtype=np.uint64)
+
+def _window_mismatches(genome : str, pattern : str) -> np.ndarray:
+    """
+        Hamming distance between pattern and the window of genome starting at
+        each position.
+    """
+    pattern_codes = encode(pattern)
+    pattern_len = len(pattern_codes)
+    windows = len(genome) - pattern_len + 1
+    if windows <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if pattern_len > 32 or (pattern_codes > 3).any():
+        return _column_mismatches(_as_array(genome), _as_array(pattern), np.arange(windows))
+
+    codes, valid = kmer_codes(genome, pattern_len)
+    pattern_code = 0
+    for code in pattern_codes.tolist():
+        pattern_code = (pattern_code << 2) | code
+
+    differences = (codes ^ codes.dtype.type(pattern_code)).astype(np.uint64)
+    differences = (differences | (differences >> np.uint64(1))) & _LOW_BITS
+    mismatches = np.bitwise_count(differences).astype(np.int64)
+
+    # windows with symbols other than ACGT are compared byte by byte
+    invalid = np.flatnonzero(~valid)
+    if len(invalid) > 0:
+        mismatches[invalid] = _column_mismatches(_as_array(genome), _as_array(pattern), invalid)
+
+    return mismatches
+
+def _column_mismatches(buffer : np.ndarray, pattern : np.ndarray, starts : np.ndarray) -> np.ndarray:
+    """
+        Hamming distance between pattern and the windows of buffer at starts,
+        comparing one pattern column at a time.
+    """
+    mismatches = np.zeros(len(starts), dtype=np.int64)
+    for j in range(len(pattern)):
+        mismatches += buffer[starts + j] != pattern[j]
+    return mismatches
+
+def _check_skew(rng):
+    # the array and streamed skews against adding up the steps one by one
+    for trial in range(100):
+        genome = "".join(rng.choice("ACGT" if trial % 4 else "ACGTN") for _ in range(rng.randint(0, 80)))
+        skew = [0]
+        for symbol in genome:
+            skew.append(skew[-1] + (symbol == "G") - (symbol == "C"))
+        assert skew_array(genome).tolist() == skew
+        assert skew_array(genome.encode()).tolist() == skew
+        assert minimum_skew(genome) == [i for i, value in enumerate(skew) if value == min(skew)]
+        for chunk_size in (1, 7, 1 << 20):
+            assert minimum_skew_file(io.BytesIO(genome.encode()), chunk_size) == minimum_skew(genome)
+
+def _check_symbol_arrays(rng):
+    # the prefix sums against the dictionary of symbol_array, every window and
+    # every step-th one
+    for trial in range(100):
+        genome = "".join(rng.choice("ACGT" if trial % 4 else "ACGTN") for _ in range(rng.randint(1, 80)))
+        step = rng.randint(1, 5)
+        arrays = symbol_arrays(genome, "ACGTN")
+        stepped = symbol_arrays(genome.encode(), "GC", step)
+        for symbol in "ACGTN":
+            expected = list(symbol_array(genome, symbol).values())
+            assert arrays[symbol].tolist() == expected
+            if symbol in stepped:
+                assert stepped[symbol].tolist() == expected[::step]
+
+def _check_aprox_matching(rng):
+    # the bit-parallel mismatch counts against hamming_distance, with patterns
+    # up to 40 nucleotides so the uint64 codes (k > 16) and the unpacked case
+    # (k > 32) are compared too
+    for trial in range(100):
+        genome = "".join(rng.choice("ACGT" if trial % 4 else "ACGTN") for _ in range(rng.randint(10, 120)))
+        k, d = rng.randint(2, 6) if trial % 3 else rng.randint(17, 40), rng.randint(0, 3)
+        start = rng.randrange(len(genome))
+        pattern = genome[start:start + k] if trial % 2 else "".join(rng.choice("ACGT") for _ in range(k))
+        matches = [i for i in range(len(genome) - len(pattern) + 1) if hamming_distance(genome[i:i + len(pattern)], pattern) <= d]
+        assert aprox_pattern_matching(genome, pattern, d) == matches
+        assert aprox_pattern_matching(genome.encode(), pattern, d) == matches
+        assert aprox_pattern_count(genome, pattern, d) == len(matches)
+
+def _check_batch_matching(rng):
+    # the pigeonhole search against hamming_distance, with patterns long
+    # enough for 27 to 32 nucleotide seeds, whose codes don't fit in a float64
+    for trial in range(100):
+        genome = "".join(rng.choice("ACGT" if trial % 4 else "ACGTN") for _ in range(rng.randint(10, 200)))
+        d = rng.randint(0, 2)
+        k = rng.randint(2, 8) if trial % 2 else rng.randint(27, 32) * (d + 1)
+        patterns = ["".join(rng.choice("ACGT") for _ in range(k)) for _ in range(2)]
+        for _ in range(2):
+            start = rng.randrange(len(genome) + 1)
+            patterns.append(genome[start:start + k].ljust(k, "T").replace("N", "G"))
+        matches = {pattern : [i for i in range(len(genome) - k + 1) if hamming_distance(genome[i:i + k], pattern) <= d] for pattern in patterns}
+        assert aprox_patterns_matching(genome, patterns, d) == matches
+    # the largest code, which has no successor in 64 bits
+    assert aprox_patterns_matching("A" + "T" * 32 + "A", ["T" * 32], 0) == {"T" * 32 : [1]}
+
+def _check_mismatch_counts(rng):
+    # the XOR neighborhoods against counting with hamming_distance, over every
+    # possible k-mer for short ones, and over the neighbors of the windows for
+    # 17 to 32 nucleotide ones (uint64 codes). Windows with N are skipped.
+    for trial in range(100):
+        k = rng.randint(2, 4) if trial % 10 else rng.randint(17, 32)
+        d = rng.randint(0, 2) if k <= 4 else rng.randint(0, 1)
+        genome = "".join(rng.choice("ACGT" if trial % 4 else "ACGTN") for _ in range(rng.randint(10, 60) if k <= 4 else k + 10))
+        kmers = [genome[i:i + k] for i in range(len(genome) - k + 1) if "N" not in genome[i:i + k]]
+        if k <= 4:
+            candidates = list(map("".join, product("ACGT", repeat=k)))
+        else:
+            windows = set(kmers) | {reverse_complement(kmer) for kmer in kmers}
+            candidates = sorted(windows | {kmer[:i] + symbol + kmer[i + 1:] for kmer in windows for i in range(k) for symbol in "ACGT"})
+
+        for reverse_complements in (False, True):
+            counts = {}
+            for candidate in candidates:
+                count = sum(hamming_distance(kmer, candidate) <= d for kmer in kmers)
+                if reverse_complements:
+                    count += sum(hamming_distance(kmer, reverse_complement(candidate)) <= d for kmer in kmers)
+                if count > 0:
+                    counts[candidate] = count
+            codes, totals = mismatch_counts(genome, k, d, reverse_complements)
+            assert dict(zip(decode_kmers(codes, k), totals.tolist())) == counts
+            best = max(counts.values(), default=0)
+            assert frequent_words_with_mismatches(genome, k, d, reverse_complements) == [kmer for kmer in counts if counts[kmer] == best]
+
+def _check_find_ori(rng):
+    # the candidates of find_ori against counting the approximate matches of
+    # each one, on both strands, in the window around the minimum skew
+    for trial in range(50):
+        genome = "".join(rng.choice("ACGT") for _ in range(rng.randint(20, 120)))
+        k, d = rng.randint(2, 5), rng.randint(0, 1)
+        window = rng.randint(k, len(genome))
+        ori = find_ori(genome.encode(), window, k, d, 50)
+        start, stop = ori["window"]
+        window_text = (genome + genome)[start:stop]
+        assert ori["minimum_skew"] == minimum_skew(genome)[0] and len(window_text) == window
+        for candidate in ori["candidates"]:
+            assert candidate["reverse_complement"] == reverse_complement(candidate["kmer"])
+            forward = [(start + i) % len(genome) for i in range(window - k + 1) if hamming_distance(window_text[i:i + k], candidate["kmer"]) <= d]
+            reverse = [(start + i) % len(genome) for i in range(window - k + 1) if hamming_distance(window_text[i:i + k], candidate["reverse_complement"]) <= d]
+            assert candidate["forward"] == forward and candidate["reverse"] == reverse
+            assert candidate["count"] == len(forward) + len(reverse)
+        counts = [candidate["count"] for candidate in ori["candidates"]]
+        assert counts == sorted(counts, reverse=True)
 
 def test_functions():
-    ecoli_file_path = os.path.join(os.path.dirname(__file__), "../decoded-genomes/escherichia_coli.txt")
-    with open(ecoli_file_path, "r") as ecoli_file:
-        ecoli_genome = ecoli_file.read()
+    vibrio_genome = load_genome(os.path.join(os.path.dirname(__file__), "../decoded-genomes/vibrio_cholerae.txt"))
     
     #this function takes forever to execute due
     #to intentional bad optimization
-    #print(symbol_array(ecoli_genome, "C")) 
+    #print(symbol_array(vibrio_genome, "C")) 
     
-    print (improved_symbol_array(ecoli_genome, "C"))
+    print (improved_symbol_array(vibrio_genome, "C"))
     print (skew_array("TAAAGACTGCCGAGAGGCCAACACGAGTGCTAGAACGAGGGGCGTAAACGCGGGTCCGAT"))
     print (minimum_skew("TAAAGACTGCCGAGAGGCCAACACGAGTGCTAGAACGAGGGGCGTAAACGCGGGTCCGAT"))
     print(aprox_pattern_matching("CCAAATCCCCTCATGGCATGCATTCCCGCAGTATTTAATCCTTTCATTCTGCATATAAGTAGTGAAGGTATAGAAACCCGTTCAAGCCCGCAGCGGTAAAACCGAGAACCATGATGAATGCACGGCGATTGCGCCATAATCCAAACA", "AATCCTTTCA", 3))
     print (aprox_pattern_count("TTTAGAGCCTTCAGAGG", "GAGG", 2))
-    
+
+    # the array, packed and streamed versions against the plain definitions
+    rng = random.Random(0)
+    _check_skew(rng)
+    _check_symbol_arrays(rng)
+    _check_aprox_matching(rng)
+    _check_batch_matching(rng)
+    _check_mismatch_counts(rng)
+    _check_find_ori(rng)
+    print("mod2 checks passed")
+
 
 if __name__ == '__main__':
     test_functions()
\ No newline at end of file
@@ -1,4 +1,11 @@
-from typing import List, Dict
+import random
+from fractions import Fraction
+from functools import cached_property, lru_cache
+from itertools import product
+from typing import List, Dict, Tuple
+import numpy as np
+from mod1 import encode, _as_str, _circular
+from mod2 import _window_mismatches
 #3.3.1
 def count_motifs(motifs : List[str]) -> Dict[str, int]:
     """
@@ -14,14 +21,8 @@ def count_motifs(motifs : List[str]) -> Dict[str, int]:
             Dict[str, int] : The count of each motif in each column of the given 
             motifs list of strings.
     """
-    count_dict = {key : [0]*len(motifs[0]) for key in "ACGT"}
-
-    for i in range(len(motifs)):
-        for j in range(len(motifs[0])):
-            nucleotide = motifs[i][j]
-            count_dict[nucleotide][j] += 1
-    
-    return count_dict
+    counts = motif_matrix(motifs).counts
+    return {key : counts[i].tolist() for i, key in enumerate("ACGT")}
 
 #3.3.2
 def profile(motifs : List[str]) -> Dict[str, List[float]]:
@@ -37,12 +38,8 @@ def profile(motifs : List[str]) -> Dict[str, List[float]]:
         ---
             Dict[str, List[float]] : The calculated profile of motifs, as a dictionary of lists.
     """
-    count_dict  = count_motifs(motifs)
-    motif_len = len(motifs)
-    for key, value in count_dict.items():
-        count_dict[key] = [x / motif_len for x in value]
-    
-    return count_dict
+    profile_array = motif_matrix(motifs).profile
+    return {key : profile_array[i].tolist() for i, key in enumerate("ACGT")}
 
 #3.3.3
 def consensus(motifs : List[str]) -> str:
@@ -58,21 +55,7 @@ def consensus(motifs : List[str]) -> str:
         ---
             str : A consensus string of Motifs.
     """
-    count_dict = count_motifs(motifs)
-    j = len(motifs)
-    concensus = ""
-    count_dict_keys = count_dict.keys()
-
-    for j in range(len(motifs[0])):
-        frequent_nucleotide = ""
-        quantity = 0
-        for key in count_dict_keys:
-            if count_dict[key][j] > quantity:
-                quantity = count_dict[key][j]
-                frequent_nucleotide = key
-        concensus += frequent_nucleotide
-    
-    return concensus 
+    return motif_matrix(motifs).consensus
 
 #3.3.4
 def score(motifs : List[str]) -> int:
@@ -88,15 +71,85 @@ def score(motifs : List[str]) -> int:
         ---
             int : The score from the given list of string motifs.
     """
-    most_frequent = consensus(motifs)
-    count = count_motifs(motifs)
-    elements_per_column = len(motifs)
-    score = 0
+    return motif_matrix(motifs).score
 
-    for j in range(len(most_frequent)):
-        score += elements_per_column - count[most_frequent[j]][j]
-        
-    return score
+#3.3.5
+class MotifMatrix:
+    """
+        A list of t motifs of length k stored as a t x k array of nucleotide codes
+        (A = 0, C = 1, G = 2, T = 3). Its counts, profile, consensus and score are
+        computed with array operations the first time they are needed and kept.
+        The instances returned by motif_matrix are shared, so their arrays are
+        read-only.
+
+        Parameters
+        ---
+            motifs : List[str]
+                The list of k-mers motifs.
+    """
+
+    def __init__(self, motifs : List[str]):
+        self.motifs = tuple(motifs)
+        self.t = len(self.motifs)
+        self.k = len(self.motifs[0])
+        self.codes = encode("".join(self.motifs)).reshape(self.t, self.k)
+        self.codes.flags.writeable = False
+
+    @cached_property
+    def counts(self) -> np.ndarray:
+        """
+            4 x k array with the count of each nucleotide (rows in ACGT order) per column.
+        """
+        counts = (self.codes[None, :, :] == np.arange(4)[:, None, None]).sum(axis=1)
+        counts.flags.writeable = False
+        return counts
+
+    @cached_property
+    def profile(self) -> np.ndarray:
+        """
+            4 x k array with the frequency of each nucleotide (rows in ACGT order) per column.
+        """
+        profile = self.counts / self.t
+        profile.flags.writeable = False
+        return profile
+
+    @cached_property
+    def consensus(self) -> str:
+        """
+            The most frequent nucleotide of each column, the first in ACGT order on ties.
+        """
+        return "".join("ACGT"[i] for i in self.counts.argmax(axis=0).tolist())
+
+    @cached_property
+    def score(self) -> int:
+        """
+            The number of nucleotides that differ from the consensus.
+        """
+        return _counts_score(self.counts, self.t)
+
+def motif_matrix(motifs : List[str]) -> MotifMatrix:
+    """
+        Returns the MotifMatrix of motifs, reusing the one built for the same
+        motifs recently so counting isn't repeated across count_motifs, profile,
+        consensus and score.
+
+        Parameters
+        ---
+            motifs : List[str]
+                The list of k-mers motifs.
+
+        Returns
+        ---
+            MotifMatrix : The array-backed matrix of motifs.
+    """
+    return _cached_motif_matrix(tuple(motifs))
+
+@lru_cache(maxsize=1024)
+def _cached_motif_matrix(motifs : tuple) -> MotifMatrix:
+    """
+        MotifMatrix of a tuple of motifs, cached by motif_matrix.
+    """
+    return MotifMatrix(motifs)
 
 
 # 3.4.1
@@ -121,7 +174,7 @@ def pr(text : str, profile : Dict[str, List[float]]) -> float:
     return p
     
 # 3.4.2
-def profile_most_probable_kmer(text : str, profile : Dict[str, List[float]], k : int) -> str:
+def profile_most_probable_kmer(text : str, profile : Dict[str, List[float]], k : int, circular : bool = False) -> str:
     """
         Finds the most probable k-mer in a string with the given profile.
 
@@ -133,23 +186,15 @@ def profile_most_probable_kmer(text : str, profile : Dict[str, List[float]], k :
                 A profile matrix.
             k : int
                 The length of the most probable k-mer.
+            circular : bool
+                Treat text as a circular genome, so the k-mers that wrap around
+                its end are considered too (default False).
         
         Returns
         ---
             str : The most probable k-mer in the given text based on the given profile.
     """
-    probability = -1
-    most_probable_text = ""
-    
-    for i in range(len(text) - k+1):
-
-        current_pr = pr(text[i:i+k], profile)
-        
-        if current_pr > probability:
-            probability = current_pr
-            most_probable_text = text[i:i+k]
-
-    return most_probable_text
+    return profile_most_probable_window(text, profile, k, circular)[0]
     
 #3.4.3
 def greedy_motif_search(dna : List[str], k : int, t : int) -> List[str]:
@@ -172,18 +217,343 @@ def greedy_motif_search(dna : List[str], k : int, t : int) -> List[str]:
                 given dna using a greedy algorithm approach.
     """
     best_motifs = [x[0:k] for x in dna]
-    
-    for i in range(len(dna[0]) - k + 1):
-        motifs = [dna[0][i:i+k]]
+    best_motifs = _greedy_trials(dna, k, t, 0, range(len(dna[0]) - k + 1), score(best_motifs))[1] or best_motifs
+
+    return best_motifs
+
+def _greedy_trials(dna : List[str], k : int, t : int, pseudocount : int, starts : range, best_score : int) -> Tuple[int, List[str]]:
+    """
+        Runs the greedy motif search trials seeded by the k-mers of dna[0] at
+        starts. A running count matrix is updated with each chosen motif instead
+        of rebuilding the profile from all of them, the windows of each string are
+        scored with window_log_probabilities, and the score of a trial is read
+        from the final counts.
+
+        Returns the score and motifs of the first trial scoring below best_score
+        and below every trial before it, or best_score and None if there is none.
+    """
+    codes = [encode(sequence) for sequence in dna[:t]]
+    columns = np.arange(k)
+    best_motifs = None
+
+    for i in starts:
+        counts = np.full((5, k), pseudocount, dtype=np.int64)
+        counts[codes[0][i:i + k], columns] += 1
+        positions = [i]
+
         for j in range(1, t):
-            prof = profile(motifs)
-            motifs.append(profile_most_probable_kmer(dna[j], prof, k))
+            log_probabilities = window_log_probabilities(dna[j], counts[:4] / (j + 4 * pseudocount), k)
+            position = _first_max(log_probabilities)
+            counts[codes[j][position:position + k], columns] += 1
+            positions.append(position)
+
+        trial_score = _counts_score(counts - pseudocount, t)
+        if trial_score < best_score:
+            best_score = trial_score
+            best_motifs = [dna[j][position:position + k] for j, position in enumerate(positions)]
+
+    return best_score, best_motifs
+
+
+#3.4.4
+def window_probabilities(text : str, profile : Dict[str, List[float]], k : int, circular : bool = False) -> np.ndarray:
+    """
+        Calculates the probability of the given profile to generate each k-mer
+        of text, multiplying one profile column at a time over all the k-mers
+        at once instead of slicing them. Same values as calling pr on every k-mer.
+
+        Parameters
+        ---
+            text : str
+                The string (str, bytes or any bytes-like object) whose k-mers are scored.
+            profile : Dict[str, List[float]]
+                The profile matrix, as a dictionary of lists or a 4 x k array with
+                the rows in ACGT order.
+            k : int
+                The length of the k-mers.
+            circular : bool
+                Treat text as a circular genome, so the k-mers that wrap around
+                its end are scored too (default False).
+
+        Returns
+        ---
+            np.ndarray : The probability of the k-mer starting at each position of text.
+    """
+    codes = encode(text)
+    if circular:
+        codes = _circular(codes, k)
+
+    matrix = _profile_array(profile)
+    windows = max(len(codes) - k + 1, 0)
+    probabilities = np.ones(windows)
+
+    for j in range(k):
+        probabilities *= matrix[codes[j:j + windows], j]
+
+    return probabilities
+
+#3.4.5
+def window_log_probabilities(text : str, profile : Dict[str, List[float]], k : int, circular : bool = False) -> np.ndarray:
+    """
+        Calculates the log-probability of the given profile to generate each
+        k-mer of text, adding one column of the log-profile at a time over all
+        the k-mers at once. Unlike the probabilities, the sums don't underflow
+        to 0.0 for long k-mers.
+
+        Parameters
+        ---
+            text : str
+                The string (str, bytes or any bytes-like object) whose k-mers are scored.
+            profile : Dict[str, List[float]]
+                The profile matrix, as a dictionary of lists or a 4 x k array with
+                the rows in ACGT order.
+            k : int
+                The length of the k-mers.
+            circular : bool
+                Treat text as a circular genome, so the k-mers that wrap around
+                its end are scored too (default False).
 
+        Returns
+        ---
+            np.ndarray : The natural logarithm of the probability of the k-mer starting
+                at each position of text (-inf for impossible k-mers).
+    """
+    codes = encode(text)
+    if circular:
+        codes = _circular(codes, k)
+
+    with np.errstate(divide="ignore"):
+        log_matrix = np.log(_profile_array(profile))
+    windows = max(len(codes) - k + 1, 0)
+    log_probabilities = np.zeros(windows)
+
+    for j in range(k):
+        log_probabilities += log_matrix[codes[j:j + windows], j]
+
+    return log_probabilities
+
+#3.4.6
+def profile_most_probable_window(text : str, profile : Dict[str, List[float]], k : int, circular : bool = False) -> Tuple[str, int, float]:
+    """
+        Finds the most probable k-mer in a string with the given profile, scoring
+        every k-mer in log space. Like profile_most_probable_kmer, the first one
+        wins when several are equally probable.
+
+        Parameters
+        ---
+            text : str
+                The string (str, bytes or any bytes-like object) to search in.
+            profile : Dict[str, List[float]]
+                The profile matrix, as a dictionary of lists or a 4 x k array with
+                the rows in ACGT order.
+            k : int
+                The length of the most probable k-mer.
+            circular : bool
+                Treat text as a circular genome, so the k-mers that wrap around
+                its end are considered too (default False).
+
+        Returns
+        ---
+            Tuple[str, int, float] : The most probable k-mer, its position in text and
+                its log-probability ("", -1 and -inf if text is shorter than k).
+    """
+    log_probabilities = window_log_probabilities(text, profile, k, circular)
+    if len(log_probabilities) == 0:
+        return "", -1, float("-inf")
+
+    best = _first_max(log_probabilities)
+    return _kmer_at(text, best, k), best, float(log_probabilities[best])
+
+def _first_max(log_probabilities : np.ndarray) -> int:
+    """
+        Position of the first maximum of log_probabilities. Values within rounding
+        error of the maximum count as ties, since sums of the same logarithms in a
+        different order can differ in the last bits.
+    """
+    best = log_probabilities.max()
+    if np.isinf(best):
+        return int(np.argmax(log_probabilities))
+    return int(np.argmax(log_probabilities >= best - 1e-9 * max(1.0, abs(best))))
+
+def _counts_score(counts : np.ndarray, t : int) -> int:
+    """
+        Score of t motifs from their count matrix (rows in ACGT order, any
+        further rows are ignored): the number of nucleotides that differ from
+        the most frequent one of their column.
+    """
+    return int(t * counts.shape[1] - counts[:4].max(axis=0).sum())
+
+def _profile_array(profile : Dict[str, List[float]]) -> np.ndarray:
+    """
+        Profile as a 5 x k array with rows in ACGT order, plus a row of zeros
+        for any other symbol.
+    """
+    if isinstance(profile, dict):
+        profile = [profile[nucleotide] for nucleotide in "ACGT"]
+    profile = np.asarray(profile, dtype=float)
+    return np.vstack((profile, np.zeros(profile.shape[1])))
+
+def _kmer_at(text : str, i : int, k : int) -> str:
+    """
+        The k-mer of text starting at position i, wrapping around its end.
+    """
+    kmer = _as_str(text[i:i + k])
+    if len(kmer) < k:
+        kmer += _as_str(text[:k - len(kmer)])
+    return kmer
+
+#3.5.1
+def distance_between_pattern_and_strings(pattern : str, dna : List[str]) -> int:
+    """
+        Sum of the minimum Hamming distances between pattern and the k-mers of
+        each dna string.
+
+        Parameters
+        ---
+            pattern : str
+                The k-mer to compare.
+            dna : List[str]
+                List of dna sequences.
+
+        Returns
+        ---
+            int : The distance between pattern and the dna strings.
+    """
+    return sum(int(_window_mismatches(text, pattern).min()) for text in dna)
+
+#3.5.2
+def median_string(dna : List[str], k : int) -> str:
+    """
+        Finds the k-mer with the minimum distance to the dna strings (the first
+        in alphabetical order on ties). The k-mers are walked as a prefix tree,
+        where the distance of a prefix to the matching prefixes of the windows
+        of every string never exceeds the distance of any k-mer starting with
+        it, so a branch whose prefix is already worse than the best k-mer found
+        is skipped. The consensus of the greedy motifs is the first best k-mer.
+
+        Parameters
+        ---
+            dna : List[str]
+                List of dna sequences.
+            k : int
+                Length of the median string.
+
+        Returns
+        ---
+            str : The median string.
+    """
+    texts = [encode(text) for text in dna]
+    windows = [len(text) - k + 1 for text in texts]
+    offsets = np.cumsum([0] + windows[:-1])
+    # nucleotide code at column j of every window of every string
+    columns = [np.concatenate([text[j:j + w] for text, w in zip(texts, windows)]) for j in range(k)]
+
+    best_pattern = consensus(greedy_motif_search(dna, k, len(dna)))
+    best_distance = distance_between_pattern_and_strings(best_pattern, dna)
+    found = False
+
+    # prefixes are pushed in reverse so they are popped in alphabetical order
+    stack = [("", np.zeros(len(columns[0]), dtype=np.int16))]
+    while stack:
+        prefix, mismatches = stack.pop()
+        distance = int(np.minimum.reduceat(mismatches, offsets).sum())
+        if distance > best_distance or (found and distance == best_distance):
+            continue
+
+        j = len(prefix)
+        if j == k:
+            if distance < best_distance or prefix < best_pattern:
+                best_pattern, best_distance = prefix, distance
+            found = True
+            continue
+
+        for code in range(3, -1, -1):
+            stack.append((prefix + "ACGT"[code], mismatches + (columns[j] != code)))
+
+    return best_pattern
+
+def _check_motif_matrix(rng):
+    # the array counts, profile, consensus and score against counting the
+    # columns one by one, and the shared cached arrays can't be modified
+    for trial in range(100):
+        t, k = rng.randint(1, 8), rng.randint(1, 20)
+        motifs = ["".join(rng.choice("ACGT") for _ in range(k)) for _ in range(t)]
+        columns = ["".join(column) for column in zip(*motifs)]
+        counts = {nucleotide : [column.count(nucleotide) for column in columns] for nucleotide in "ACGT"}
+        assert count_motifs(motifs) == counts
+        assert np.allclose([profile(motifs)[nucleotide] for nucleotide in "ACGT"], [np.array(counts[nucleotide]) / t for nucleotide in "ACGT"])
+        assert consensus(motifs) == "".join(max("ACGT", key=column.count) for column in columns)
+        assert score(motifs) == sum(t - max(column.count(nucleotide) for nucleotide in "ACGT") for column in columns)
+
+        matrix = motif_matrix(motifs)
+        assert matrix is motif_matrix(list(motifs))
+        for array in (matrix.codes, matrix.counts, matrix.profile):
+            try:
+                array[0, 0] = 0
+            except ValueError:
+                continue
+            raise AssertionError("the cached motif matrix is writable")
+
+def _check_window_probabilities(rng):
+    # the column by column (log-)probabilities against pr on every sliced k-mer
+    for trial in range(100):
+        t, k = rng.randint(1, 5), rng.randint(1, 8)
+        motifs = ["".join(rng.choice("ACGT") for _ in range(k)) for _ in range(t)]
+        motif_profile = profile(motifs)
+        text = "".join(rng.choice("ACGT") for _ in range(rng.randint(k, 40)))
+        for circular in (False, True):
+            sliced = _circular(text, k) if circular else text
+            kmers = [sliced[i:i + k] for i in range(len(sliced) - k + 1)]
+            probabilities = [pr(kmer, motif_profile) for kmer in kmers]
+            assert np.allclose(window_probabilities(text, motif_profile, k, circular), probabilities)
+            with np.errstate(divide="ignore"):
+                assert np.allclose(window_log_probabilities(text.encode(), motif_profile, k, circular), np.log(probabilities))
+            kmer, position, _ = profile_most_probable_window(text, motif_profile, k, circular)
+            assert kmer == kmers[position]
+            assert position == min(i for i, probability in enumerate(probabilities) if probability >= max(probabilities) * (1 - 1e-9))
+        # equally probable k-mers may compare differently after rounding
+        most_probable = profile_most_probable_kmer(text, motif_profile, k)
+        assert pr(most_probable, motif_profile) >= max(pr(text[i:i + k], motif_profile) for i in range(len(text) - k + 1)) * (1 - 1e-9)
+
+def _string_greedy_motif_search(dna : List[str], k : int, t : int, pseudocount : int = 0) -> List[str]:
+    """
+        Greedy motif search that rebuilds the profile of the chosen motifs for
+        every string and multiplies exact fractions, the plain definition the
+        incremental search is checked against.
+    """
+    best_motifs = [x[0:k] for x in dna]
+
+    for i in range(len(dna[0]) - k + 1):
+        motifs = [dna[0][i:i + k]]
+        for j in range(1, t):
+            columns = list(zip(*motifs))
+            motif_profile = {nucleotide : [Fraction(column.count(nucleotide) + pseudocount, j + 4 * pseudocount) for column in columns] for nucleotide in "ACGT"}
+            kmers = [dna[j][p:p + k] for p in range(len(dna[j]) - k + 1)]
+            probabilities = [np.prod([motif_profile[nucleotide][c] for c, nucleotide in enumerate(kmer)]) for kmer in kmers]
+            motifs.append(kmers[probabilities.index(max(probabilities))])
         if score(motifs) < score(best_motifs):
             best_motifs = motifs
 
     return best_motifs
 
+def _check_greedy_motif_search(rng):
+    # the incremental counts and log-probabilities against the plain definition
+    for trial in range(30):
+        t, k = rng.randint(1, 5), rng.randint(1, 6)
+        dna = ["".join(rng.choice("ACGT") for _ in range(rng.randint(k, 25))) for _ in range(t)]
+        assert greedy_motif_search(dna, k, t) == _string_greedy_motif_search(dna, k, t)
+
+def _check_median_string(rng):
+    # the branch and bound against the distance of every possible k-mer
+    for trial in range(100):
+        t, k = rng.randint(1, 5), rng.randint(1, 4)
+        dna = ["".join(rng.choice("ACGT") for _ in range(rng.randint(k, 15))) for _ in range(t)]
+        distances = {}
+        for pattern in map("".join, product("ACGT", repeat=k)):
+            distances[pattern] = sum(min(sum(a != b for a, b in zip(pattern, sequence[i:i + k])) for i in range(len(sequence) - k + 1)) for sequence in dna)
+            if trial % 10 == 0:
+                assert distance_between_pattern_and_strings(pattern, dna) == distances[pattern]
+        assert median_string(dna, k) == min(distances, key=distances.get)
 
 def test_functions():
 
@@ -237,6 +607,16 @@ def test_functions():
     print(profile_most_probable_kmer(profile_most_probable_kmer_input[0], 
         profile_most_probable_kmer_input[1], profile_most_probable_kmer_input[2]))
     print(greedy_motif_search(greedy_motif_search_input[0], greedy_motif_search_input[1], greedy_motif_search_input[2]))
+    print(median_string(["AAATTGACGCAT", "GACGACCACGTT", "CGTCAGCGCCTG", "GCTGAGCACCGG", "AGTTCGGGACAG"], 3))
+
+    # the array versions against the plain string definitions
+    rng = random.Random(0)
+    _check_motif_matrix(rng)
+    _check_window_probabilities(rng)
+    _check_greedy_motif_search(rng)
+    _check_median_string(rng)
+    print("mod3 checks passed")
+
 
 if __name__ == '__main__':
     test_functions()
\ No newline at end of file
@@ -1,6 +1,13 @@
 import random
 from typing import List, Dict
+import numpy as np
 from mod3 import *
+from mod1 import encode, _as_str, _circular
+from mod3 import _counts_score, _greedy_trials, _string_greedy_motif_search
+
+# called as iteration_hook(search, iteration, score) after every iteration of the
+# randomized motif search and the Gibbs sampler when set (see instrument.py)
+iteration_hook = None
 
 #4.1.1
 def count_with_pseudocounts(motifs: List[str]) -> Dict[str, List[int]]:
@@ -17,17 +24,8 @@ def count_with_pseudocounts(motifs: List[str]) -> Dict[str, List[int]]:
         ---
            Dict[str, List[int]]:  The count of each nucleotide.
     """
-    motif_len = len(motifs[0])
-    count_dict = {key : [1]*motif_len for key in "ACGT"}
-    matrix_len = len(motifs)
-
-    
-    for i in range(matrix_len):
-        for j in range(motif_len):
-            nucleotide = motifs[i][j]
-            count_dict[nucleotide][j] += 1
-    
-    return count_dict
+    counts = motif_matrix(motifs).counts + 1
+    return {key : counts[i].tolist() for i, key in enumerate("ACGT")}
 
 #4.1.2
 def profile_with_pseudocounts(motifs: List[str]) -> Dict[str, List[str]]:
@@ -46,14 +44,10 @@ def profile_with_pseudocounts(motifs: List[str]) -> Dict[str, List[str]]:
             in the motifs list using Laplace's rule of Succession.
 
     """
-    pseudocounts = count_with_pseudocounts(motifs)
     # we add 4 because we are adding 1 per nucleotide (ACTG), according
     # to Laplace's rule of succession 
-    divider = len(motifs) + 4 
-    for key, value in pseudocounts.items():
-            pseudocounts[key] = [x / divider for x in value]
-
-    return pseudocounts
+    profile_array = (motif_matrix(motifs).counts + 1) / (len(motifs) + 4)
+    return {key : profile_array[i].tolist() for i, key in enumerate("ACGT")}
 
 #4.1.3
 def greedy_motif_search_with_pseudocounts(dna: List[str], k: int, t: int) -> List[str]:
@@ -76,15 +70,7 @@ def greedy_motif_search_with_pseudocounts(dna: List[str], k: int, t: int) -> Lis
             List[str] : Strings of length k containing the resulting t motifs. 
     """
     best_motifs = [x[0:k] for x in dna]
-    
-    for i in range(len(dna[0]) - k + 1):
-        motifs = [dna[0][i:i+k]]
-        for j in range(1, t):
-            prof = profile_with_pseudocounts(motifs)
-            motifs.append(profile_most_probable_kmer(dna[j], prof, k))
-
-        if score(motifs) < score(best_motifs):
-            best_motifs = motifs
+    best_motifs = _greedy_trials(dna, k, t, 1, range(len(dna[0]) - k + 1), score(best_motifs))[1] or best_motifs
 
     return best_motifs
 
@@ -115,7 +101,7 @@ def motifs(profile: Dict[str, List[float]], dna: List[str]) -> List[str]:
     return result_motifs
 
 #4.2.2
-def random_motifs(dna: List[str], k: int , t: int) -> List[str]:
+def random_motifs(dna: List[str], k: int , t: int, rng: random.Random = None) -> List[str]:
     """
         Generates a list of random t motifs of length k each from a list of string dna.
 
@@ -127,20 +113,23 @@ def random_motifs(dna: List[str], k: int , t: int) -> List[str]:
                 Length of the resulting motifs
             t : int
                 Number of the resutling motifs
+            rng : random.Random
+                Random number generator to draw from (default, the random module).
         Returns
         ---
             List[str] : randomly picked t motifs of lenght k.
 
     """
+    rng = rng or random
     result = []
     for i in dna:
-        random_kmer = random.randint(0, len(dna[0]) - k)
+        random_kmer = rng.randint(0, len(dna[0]) - k)
         result.append(i[random_kmer:random_kmer+k])
     
     return result
 
 #4.2.3
-def randomized_motif_search(dna: List[str], k: int, t: int) -> List[str]:
+def randomized_motif_search(dna: List[str], k: int, t: int, rng: random.Random = None) -> List[str]:
     """
         Generates a list of random t motifs of length k each from a list of string dna using
         a cotinuously improving best motifs search.
@@ -153,16 +142,23 @@ def randomized_motif_search(dna: List[str], k: int, t: int) -> List[str]:
                 Length of the resulting motifs
             t : int
                 Number of the resutling motifs
+            rng : random.Random
+                Random number generator to draw from (default, the random module).
         Returns
         ---
             List[str]: List of best possible t motifs of lenght k.
     """
 
-    mot = best_motifs = random_motifs(dna, k, t)
+    mot = best_motifs = random_motifs(dna, k, t, rng)
+    iteration = 0
     while True:
         profile = profile_with_pseudocounts(mot)
         mot = motifs(profile, dna)
-        if score(mot) < score(best_motifs):
+        mot_score = score(mot)
+        if iteration_hook is not None:
+            iteration_hook("randomized_motif_search", iteration, mot_score)
+        iteration += 1
+        if mot_score < score(best_motifs):
             best_motifs = mot
         else:
             return best_motifs
@@ -186,7 +182,7 @@ def normalize(probabilities : Dict[str, float]) -> Dict[str, float]:
     return {key : value / total for key, value in probabilities.items()}
 
 #4.4.2
-def weighted_dice(probabilities : Dict[str, float]) -> str:
+def weighted_dice(probabilities : Dict[str, float], rng : random.Random = None) -> str:
     """
         Randomly chooses a k-mer from the input.
 
@@ -195,21 +191,19 @@ def weighted_dice(probabilities : Dict[str, float]) -> str:
             probabilities : Dict[str, float]
                 A dictionary of probabilities, where keys are k-mers and values 
                 are the probabilities of these k-mers (they have to sum up 1).
+            rng : random.Random
+                Random number generator to draw from (default, the random module).
 
         Returns
         ---
             str : A randomly chosen k-mer with respect to the values in the probabilities input.
     """
 
-    prob = random.uniform(0, 1)
-    total = 0
-    for key in probabilities:
-        if total <= prob <= (total + probabilities[key]):
-            return key
-        total += probabilities[key]
+    keys = list(probabilities)
+    return keys[WeightedSampler(list(probabilities.values())).draw(rng)]
 
 #4.4.3
-def profile_generated_string(text : str, profile : Dict[str, List[float]], k : int) -> Dict[str, List[float]]:
+def profile_generated_string(text : str, profile : Dict[str, List[float]], k : int, circular : bool = False, rng : random.Random = None) -> str:
     """
         Randomly chooses a k-mer from a string 'text' based on a profile matrix 'profile'.
 
@@ -224,24 +218,30 @@ def profile_generated_string(text : str, profile : Dict[str, List[float]], k : i
             k : int
                 Length of the chosen mer.
 
+            circular : bool
+                Treat text as a circular genome, so the k-mers that wrap around
+                its end can be chosen too (default False).
+
+            rng : random.Random
+                Random number generator to draw from (default, the random module).
+
         Returns
         ---
-            Dict[str, List[float]]: Randomly chosen str of size k.
+            str: Randomly chosen str of size k.
             
     """
-    n = len(text)
-    probabilities = {}
-    
-    for i in range(n-k+1):
-        probabilities[text[i:i+k]] = pr(text[i:i+k], profile)
-    probabilities = normalize(probabilities)
-
-    return weighted_dice(probabilities)
+    text = _as_str(text)
+    index = WeightedSampler(window_probabilities(text, profile, k, circular)).draw(rng)
+    return (_circular(text, k) if circular else text)[index:index + k]
     
 #4.4.4
-def gibbs_sampler(dna : List[str], k : int, t : int, n : int = 100) -> List[str]:
+def gibbs_sampler(dna : List[str], k : int, t : int, n : int = 100, rng : random.Random = None) -> List[str]:
     """
         Returns a list of best posible motifs using the Gibbs sampler method.
+        On each iteration one motif is dropped, the profile of the others (with
+        pseudocounts) is obtained by taking it out of a running count matrix, and
+        a new motif is drawn from its sequence with probability proportional
+        to how likely the profile is to generate it.
 
         Parameters
         ---
@@ -253,25 +253,168 @@ def gibbs_sampler(dna : List[str], k : int, t : int, n : int = 100) -> List[str]
                 Amount of generated motifs.
             n : int
                 Number of iterations for finding the motifs (default 100).
+            rng : random.Random
+                Random number generator to draw from (default, the random module).
         
         Returns
         ---
             Lis[str] : List of best possible motifs.
     """
+    rng = rng or random
+    codes = [encode(sequence) for sequence in dna[:t]]
+    columns = np.arange(k)
+
+    positions = [rng.randint(0, len(sequence) - k) for sequence in dna[:t]]
+    counts = np.zeros((5, k), dtype=np.int64)
+    for sequence, position in zip(codes, positions):
+        counts[sequence[position:position + k], columns] += 1
 
-    best_motifs = random_motifs(dna, k, t)
+    best_positions = list(positions)
+    best_score = _counts_score(counts, t)
     
-    for i in range(n):
-        
-        rand = random.randint(1, t)
-        prof = profile_with_pseudocounts(best_motifs)
-        motif = motifs(prof, dna)
+    for iteration in range(n):
         
-        if score(motif) < score(best_motifs):
-            best_motifs = motif
+        i = rng.randrange(t)
+        counts[codes[i][positions[i]:positions[i] + k], columns] -= 1
+
+        log_probabilities = window_log_probabilities(dna[i], _gibbs_profile(counts, t), k)
+        positions[i] = _sample_window(log_probabilities, rng)
+        counts[codes[i][positions[i]:positions[i] + k], columns] += 1
+
+        current_score = _counts_score(counts, t)
+        if iteration_hook is not None:
+            iteration_hook("gibbs_sampler", iteration, current_score)
+        if current_score < best_score:
+            best_score = current_score
+            best_positions = list(positions)
     
-    return best_motifs
-        
+    return [dna[j][position:position + k] for j, position in enumerate(best_positions)]
+
+def _gibbs_profile(counts : np.ndarray, t : int) -> np.ndarray:
+    """
+        Profile with pseudocounts of the t - 1 motifs left in counts, as a
+        4 x k array.
+    """
+    return (counts[:4] + 1) / (t - 1 + 4)
+
+def _sample_window(log_probabilities : np.ndarray, rng : random.Random) -> int:
+    """
+        Draws a window with probability proportional to exp(log_probabilities).
+    """
+    return WeightedSampler(_relative_probabilities(log_probabilities)).draw(rng)
+
+def _relative_probabilities(log_probabilities : np.ndarray) -> np.ndarray:
+    """
+        Probabilities proportional to exp(log_probabilities), scaled so the
+        largest is 1 to avoid underflow. Uniform if every one is -inf.
+    """
+    best = log_probabilities.max()
+    if np.isinf(best):
+        return np.ones(len(log_probabilities))
+    return np.exp(log_probabilities - best)
+
+#4.4.5
+class WeightedSampler:
+    """
+        Draws indices with probability proportional to a list of weights, by a
+        binary search over their cumulative sums. Building it is linear on the
+        number of weights and every draw after that is logarithmic, so it can be
+        built once and drawn from many times. If every weight is zero the draws
+        are uniform.
+
+        Parameters
+        ---
+            weights : np.ndarray
+                Non-negative weights (they do not necessarily sum up to 1).
+    """
+
+    def __init__(self, weights : np.ndarray):
+        self.cumulative = np.cumsum(weights, dtype=np.float64)
+        if len(self.cumulative) == 0:
+            raise ValueError("there are no weights to draw from")
+        if self.cumulative[-1] <= 0:
+            self.cumulative = np.arange(1, len(self.cumulative) + 1, dtype=np.float64)
+
+    def draw(self, rng : random.Random = None) -> int:
+        """
+            Draws one index.
+        """
+        rng = rng or random
+        index = np.searchsorted(self.cumulative, rng.random() * self.cumulative[-1], side="right")
+        return int(min(index, len(self.cumulative) - 1))
+
+    def draws(self, size : int, rng : random.Random = None) -> np.ndarray:
+        """
+            Draws size indices at once.
+        """
+        rng = rng or random
+        points = np.array([rng.random() for _ in range(size)]) * self.cumulative[-1]
+        indices = np.searchsorted(self.cumulative, points, side="right")
+        return np.minimum(indices, len(self.cumulative) - 1)
+
+def _check_pseudocounts(rng):
+    # the pseudocounts are added to new arrays, the shared motif matrix keeps
+    # the plain counts
+    for trial in range(50):
+        t, k = rng.randint(1, 6), rng.randint(1, 10)
+        motifs = ["".join(rng.choice("ACGT") for _ in range(k)) for _ in range(t)]
+        counts = count_motifs(motifs)
+        assert count_with_pseudocounts(motifs) == {nucleotide : [count + 1 for count in counts[nucleotide]] for nucleotide in "ACGT"}
+        assert np.allclose([profile_with_pseudocounts(motifs)[nucleotide] for nucleotide in "ACGT"],
+            [(np.array(counts[nucleotide]) + 1) / (t + 4) for nucleotide in "ACGT"])
+        assert count_motifs(motifs) == counts
+
+def _check_greedy_with_pseudocounts(rng):
+    # the incremental counts against the plain definition with pseudocounts
+    for trial in range(30):
+        t, k = rng.randint(1, 5), rng.randint(1, 6)
+        dna = ["".join(rng.choice("ACGT") for _ in range(rng.randint(k, 25))) for _ in range(t)]
+        assert greedy_motif_search_with_pseudocounts(dna, k, t) == _string_greedy_motif_search(dna, k, t, 1)
+
+def _check_gibbs_sampler(rng):
+    # the running counts against rebuilding the profile of the other motifs on
+    # every iteration, drawing from the same random numbers
+    for trial in range(20):
+        t, k, n = rng.randint(2, 5), rng.randint(1, 6), rng.randint(0, 30)
+        dna = ["".join(rng.choice("ACGT") for _ in range(rng.randint(k, 25))) for _ in range(t)]
+        seed = rng.random()
+        reference = random.Random(seed)
+        positions = [reference.randint(0, len(sequence) - k) for sequence in dna]
+        motifs = [sequence[p:p + k] for sequence, p in zip(dna, positions)]
+        best_motifs = list(motifs)
+        for _ in range(n):
+            i = reference.randrange(t)
+            motif_profile = profile_with_pseudocounts(motifs[:i] + motifs[i + 1:])
+            probabilities = [pr(dna[i][p:p + k], motif_profile) for p in range(len(dna[i]) - k + 1)]
+            p = WeightedSampler(probabilities).draw(reference)
+            motifs[i] = dna[i][p:p + k]
+            if score(motifs) < score(best_motifs):
+                best_motifs = list(motifs)
+        assert gibbs_sampler(dna, k, t, n, random.Random(seed)) == best_motifs
+
+    # the course example reaches its best score from some of the starts
+    dna = [
+        "CGCCCCTCTCGGGGGTGTTCAGTAAACGGCCA",
+        "GGGCGAGGTATGTGTAAGTGCCAAGGTGCCAG",
+        "TAGTACCGAGACCGAAAGAAGTATACAGGCGT",
+        "TAGATCAAGTTTCAGGTGCACGTCGGTGAACC",
+        "AATCCACCAGCTCCACGTGCAATGTTGGCCTA"
+    ]
+    assert min(score(gibbs_sampler(dna, 8, 5, 100, random.Random(seed))) for seed in range(20)) == 9
+
+def _check_samplers(rng):
+    # the samplers against the distributions they draw from
+    sampler = WeightedSampler([0, 1, 2, 0, 1])
+    for draws in (sampler.draws(40000, rng), [sampler.draw(rng) for _ in range(40000)]):
+        assert np.allclose(np.bincount(draws, minlength=5) / len(draws), [0, 0.25, 0.5, 0, 0.25], atol=0.01)
+    assert set(WeightedSampler([0, 0, 0]).draws(1000, rng).tolist()) == {0, 1, 2}
+    rolls = [weighted_dice({"A": 0.2, "C": 0.0, "G": 0.8}, rng) for _ in range(20000)]
+    assert rolls.count("C") == 0 and abs(rolls.count("A") / len(rolls) - 0.2) < 0.01
+    # every window is drawn with its own probability, repeated k-mers included
+    uniform = {nucleotide : [0.25, 0.25] for nucleotide in "ACGT"}
+    kmers = [profile_generated_string("AAAAAC", uniform, 2, rng=rng) for _ in range(20000)]
+    assert abs(kmers.count("AA") / len(kmers) - 0.8) < 0.01
+
 def test_functions():
     count_with_pseudocounts_input = [
         "AACGTA",
@@ -357,5 +500,14 @@ def test_functions():
         profile_generated_string_input[0], profile_generated_string_input[1], profile_generated_string_input[2]))
     print(gibbs_sampler(gibbs_sampler_input[0], gibbs_sampler_input[1], gibbs_sampler_input[2], gibbs_sampler_input[3]))
 
+    # the array versions against the plain definitions
+    rng = random.Random(0)
+    _check_pseudocounts(rng)
+    _check_greedy_with_pseudocounts(rng)
+    _check_gibbs_sampler(rng)
+    _check_samplers(rng)
+    print("mod4 checks passed")
+
+
 if __name__ == '__main__':
     test_functions()
\ No newline at end of file
@@ -0,0 +1,429 @@
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+import numpy as np
+from mod1 import decode_kmers, encode, frequency_map, kmer_codes, pattern_count, pattern_match_positions, _as_array, _count_codes, _find_all, _first_positions
+from mod2 import aprox_pattern_matching, aprox_pattern_positions, skew_array, _SKEW_STEPS
+from mod3 import greedy_motif_search, score, _greedy_trials
+from mod4 import greedy_motif_search_with_pseudocounts, randomized_motif_search
+
+# views of the shared memory blocks a worker process is attached to
+_genome = None
+_output = None
+_blocks = []
+
+def _attach(genome_name : str, genome_len : int, output_name : str = None) -> None:
+    """
+        Pool initializer: attaches the worker to the shared genome (and output) blocks.
+    """
+    global _genome, _output
+    _genome = _open_shared(genome_name).buf[:genome_len]
+    if output_name is not None:
+        _output = np.frombuffer(_open_shared(output_name).buf, dtype=np.int32)
+
+def _open_shared(name : str) -> shared_memory.SharedMemory:
+    """
+        Attaches to an existing shared memory block, which stays owned (and is
+        unlinked) by the process that created it.
+    """
+    block = shared_memory.SharedMemory(name=name)
+    _blocks.append(block)
+    return block
+
+def _chunks(windows : int, workers : int) -> List[range]:
+    """
+        Splits the window start positions into about twice as many ranges as
+        workers, so they stay busy if some chunks are slower.
+    """
+    if windows <= 0:
+        return []
+
+    count = min(windows, 2 * workers)
+    bounds = [windows * i // count for i in range(count + 1)]
+    return [range(bounds[i], bounds[i + 1]) for i in range(count)]
+
+def _run(genome : str, overlap : int, task, args : tuple, workers : int = None, output_size : int = None) -> list:
+    """
+        Runs task on every chunk of the genome in a process pool. The genome is
+        copied once into shared memory that the workers read in place; each
+        chunk covers a range of window starts plus overlap extra bases, so
+        windows crossing a chunk boundary are seen exactly once.
+    """
+    buffer = _as_array(genome)
+    workers = workers or os.cpu_count()
+    chunks = _chunks(len(buffer) - overlap, workers)
+
+    genome_block = shared_memory.SharedMemory(create=True, size=max(len(buffer), 1))
+    output_block = None
+    try:
+        np.frombuffer(genome_block.buf, dtype=np.uint8, count=len(buffer))[:] = buffer
+        output_name = None
+        if output_size is not None:
+            output_block = shared_memory.SharedMemory(create=True, size=max(4 * output_size, 1))
+            output_name = output_block.name
+
+        with ProcessPoolExecutor(workers, initializer=_attach, initargs=(genome_block.name, len(buffer), output_name)) as pool:
+            futures = [pool.submit(task, chunk.start, chunk.stop, overlap, *args) for chunk in chunks]
+            results = [future.result() for future in futures]
+
+        if output_block is not None:
+            results = (results, np.frombuffer(output_block.buf, dtype=np.int32, count=output_size).copy())
+    finally:
+        genome_block.close()
+        genome_block.unlink()
+        if output_block is not None:
+            output_block.close()
+            output_block.unlink()
+
+    return results
+
+def _count_task(start : int, stop : int, overlap : int, pattern : str) -> int:
+    """
+        Counts pattern in a chunk of the shared genome.
+    """
+    count = 0
+    for _ in _find_all(_genome[start:stop + overlap], pattern):
+        count += 1
+    return count
+
+def _positions_task(start : int, stop : int, overlap : int, pattern : str) -> np.ndarray:
+    """
+        Positions of pattern in a chunk of the shared genome.
+    """
+    return np.fromiter(_find_all(_genome[start:stop + overlap], pattern), dtype=np.int64) + start
+
+def _kmers_task(start : int, stop : int, overlap : int, k : int) -> tuple:
+    """
+        Packed k-mer counts and first positions of a chunk of the shared genome,
+        None if the chunk has symbols other than ACGT.
+    """
+    codes, valid = kmer_codes(_genome[start:stop + overlap], k)
+    if not valid.all():
+        return None
+    kmers, counts = _count_codes(codes, k)
+    return kmers, counts, _first_positions(codes, kmers) + start
+
+def _aprox_task(start : int, stop : int, overlap : int, pattern : str, d : int) -> np.ndarray:
+    """
+        Approximate occurrences of pattern in a chunk of the shared genome.
+    """
+    return aprox_pattern_positions(_genome[start:stop + overlap], pattern, d) + start
+
+def _skew_task(start : int, stop : int, overlap : int) -> int:
+    """
+        Writes the skew of a chunk of the shared genome, starting from 0, to the
+        shared output and returns the skew at its end.
+    """
+    np.cumsum(_SKEW_STEPS[encode(_genome[start:stop])], dtype=np.int32, out=_output[start + 1:stop + 1])
+    return int(_output[stop]) if stop > start else 0
+
+def parallel_pattern_count(text : str, pattern : str, workers : int = None) -> int:
+    """
+        Counts the times the given pattern is present in text, like
+        mod1.pattern_count, splitting text among a pool of processes.
+
+        Parameters
+        ---
+            text : str
+                The text (str, bytes or any bytes-like object) to search in.
+            pattern : str
+                The pattern to search in text.
+            workers : int
+                Number of worker processes (default, one per CPU).
+
+        Returns
+        ---
+            int : How many times the pattern string is present in text.
+    """
+    return sum(_run(text, len(pattern) - 1, _count_task, (pattern,), workers))
+
+def parallel_pattern_match_positions(pattern : str, genome : str, workers : int = None) -> List[int]:
+    """
+        Returns the positions in genome where pattern starts, like
+        mod1.pattern_match_positions, splitting genome among a pool of processes.
+
+        Parameters
+        ---
+            pattern : str
+                The pattern to find.
+            genome : str
+                The genome (str, bytes or any bytes-like object) to search in.
+            workers : int
+                Number of worker processes (default, one per CPU).
+
+        Returns
+        ---
+            List[int] : List of all positions where the given pattern starts in genome.
+    """
+    results = _run(genome, len(pattern) - 1, _positions_task, (pattern,), workers)
+    return np.concatenate(results).tolist() if results else []
+
+def parallel_frequency_map(text : str, k : int, workers : int = None) -> Dict[str, int]:
+    """
+        Creates the frequency map of the k-mers of text, like mod1.frequency_map,
+        counting the packed k-mers of each chunk in a pool of processes and
+        merging the counts.
+
+        Parameters
+        ---
+            text : str
+                Nucleotide string (str, bytes or any bytes-like object).
+            k : int
+                Length of the mers in the frequency map.
+            workers : int
+                Number of worker processes (default, one per CPU).
+
+        Returns
+        ---
+            Dict[str, int] : Dictionary of k-mers and the times they are present in text.
+    """
+    # k-mers longer than 32 can't be packed, they are counted as strings
+    if k > 32:
+        return frequency_map(text, k)
+
+    results = _run(text, k - 1, _kmers_task, (k,), workers)
+
+    # texts with symbols other than ACGT are counted as strings
+    if any(result is None for result in results) or not results:
+        return frequency_map(text, k)
+
+    kmers, inverse = np.unique(np.concatenate([result[0] for result in results]), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([result[1] for result in results])).astype(np.int64)
+    first = np.full(len(kmers), len(text), dtype=np.int64)
+    np.minimum.at(first, inverse, np.concatenate([result[2] for result in results]))
+
+    order = np.argsort(first, kind="stable")
+    return dict(zip(decode_kmers(kmers[order], k), counts[order].tolist()))
+
+def parallel_aprox_pattern_matching(genome : str, pattern : str, d : int, workers : int = None) -> List[int]:
+    """
+        Finds the starting positions of the approximate occurrences of a pattern in
+        a genome, like mod2.aprox_pattern_matching, splitting genome among a pool
+        of processes.
+
+        Parameters
+        ---
+            genome : str
+                The genome (str, bytes or any bytes-like object) to search in.
+            pattern : str
+                The pattern string to search for.
+            d : int
+                The maximum number of mismatches allowed.
+            workers : int
+                Number of worker processes (default, one per CPU).
+
+        Returns
+        ---
+            List[int] : Starting positions where pattern is a substring of genome
+                with maximum d mismatches.
+    """
+    results = _run(genome, len(pattern) - 1, _aprox_task, (pattern, d), workers)
+    return np.concatenate(results).tolist() if results else []
+
+def parallel_skew_array(genome : str, workers : int = None) -> np.ndarray:
+    """
+        Finds the skew array of the genome, like mod2.skew_array. Every worker
+        writes the skew of its chunk, starting from 0, straight into a shared
+        output array, and the chunks are then shifted by the skew at the end of
+        the chunks before them.
+
+        Parameters
+        ---
+            genome : str
+                The genome (str, bytes or any bytes-like object).
+            workers : int
+                Number of worker processes (default, one per CPU).
+
+        Returns
+        ---
+            np.ndarray : int32 skew array with the counts of # of G's minus # of C's.
+    """
+    genome_len = len(genome)
+    totals, skew = _run(genome, 0, _skew_task, (), workers, output_size=genome_len + 1)
+    skew[0] = 0
+
+    chunks = _chunks(genome_len, workers or os.cpu_count())
+    offset = 0
+    for chunk, total in zip(chunks, totals):
+        skew[chunk.start + 1:chunk.stop + 1] += offset
+        offset += total
+
+    return skew
+
+def parallel_greedy_motif_search(dna : List[str], k : int, t : int, pseudocounts : bool = False, workers : int = None) -> List[str]:
+    """
+        Runs the greedy motif search, like mod3.greedy_motif_search (or
+        mod4.greedy_motif_search_with_pseudocounts), spreading the trials seeded
+        by each k-mer of dna[0] among a pool of processes. The best motifs of
+        every worker are reduced in order of their starting k-mers, so the first
+        best-scoring trial wins as in the serial search.
+
+        Parameters
+        ---
+            dna : List[str]
+                The DNA strings to search in.
+            k : int
+                The length of the resulting k-mers.
+            t : int
+                The amount of k-mers to return.
+            pseudocounts : bool
+                Build the profiles with pseudocounts (default False).
+            workers : int
+                Number of worker processes (default, one per CPU).
+
+        Returns
+        ---
+            List[str] : Array of t motifs of length k from the given dna.
+    """
+    best_motifs = [x[0:k] for x in dna]
+    best_score = score(best_motifs)
+    workers = workers or os.cpu_count()
+    chunks = _chunks(len(dna[0]) - k + 1, workers)
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_greedy_trials, dna, k, t, int(pseudocounts), chunk, best_score) for chunk in chunks]
+        results = [future.result() for future in futures]
+
+    for trial_score, motifs in results:
+        if motifs is not None and trial_score < best_score:
+            best_score = trial_score
+            best_motifs = motifs
+
+    return best_motifs
+
+def multistart_randomized_motif_search(dna : List[str], k : int, t : int, restarts : int = 1000, seed : int = 0,
+                                       patience : int = None, time_budget : float = None,
+                                       workers : int = None) -> Tuple[List[str], List[int]]:
+    """
+        Runs mod4.randomized_motif_search from many random starts in a pool of
+        processes and keeps the best motifs. Every restart gets its own seed,
+        spawned from seed, and the results are taken in restart order, so a run
+        is reproducible whatever the number of workers (unless it is cut short
+        by time_budget).
+
+        Parameters
+        ---
+            dna : List[str]
+                The DNA strings to search in.
+            k : int
+                Length of the resulting motifs.
+            t : int
+                Number of the resulting motifs.
+            restarts : int
+                Maximum number of restarts (default 1000).
+            seed : int
+                Seed the seeds of the restarts are spawned from (default 0).
+            patience : int
+                Stop after this many restarts in a row without improving the best
+                score (default None, never).
+            time_budget : float
+                Stop starting new restarts after this many seconds (default None, never).
+            workers : int
+                Number of worker processes (default, one per CPU).
+
+        Returns
+        ---
+            Tuple[List[str], List[int]] : The best motifs found, and the best score
+                after each restart.
+    """
+    workers = workers or os.cpu_count()
+    seeds = (int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(restarts))
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+
+    best_motifs = None
+    best_score = None
+    trajectory = []
+    stale = 0
+
+    with ProcessPoolExecutor(workers) as pool:
+        # keep a couple of restarts per worker in flight, in restart order
+        pending = deque()
+        for restart_seed in seeds:
+            pending.append(pool.submit(_randomized_restart, dna, k, t, restart_seed))
+            if len(pending) >= 2 * workers:
+                break
+
+        while pending:
+            restart_score, motifs = pending.popleft().result()
+            if best_score is None or restart_score < best_score:
+                best_score = restart_score
+                best_motifs = motifs
+                stale = 0
+            else:
+                stale += 1
+            trajectory.append(best_score)
+
+            if (patience is not None and stale >= patience) or (deadline is not None and time.monotonic() > deadline):
+                for future in pending:
+                    future.cancel()
+                break
+
+            restart_seed = next(seeds, None)
+            if restart_seed is not None:
+                pending.append(pool.submit(_randomized_restart, dna, k, t, restart_seed))
+
+    return best_motifs, trajectory
+
+def _randomized_restart(dna : List[str], k : int, t : int, seed : int) -> Tuple[int, List[str]]:
+    """
+        One restart of the randomized motif search with its own generator.
+    """
+    motifs = randomized_motif_search(dna, k, t, random.Random(seed))
+    return score(motifs), motifs
+
+def _check_scans(rng):
+    # the merged results of the workers against the serial functions, with
+    # matches and k-mers that straddle the chunk boundaries
+    for alphabet in ("ACGT", "ACGTN"):
+        genome = "".join(rng.choice(alphabet) for _ in range(20000))
+        pattern = genome[5000:5009]
+        long_pattern = genome[7000:7025]
+        for workers in (1, 3, 7):
+            assert parallel_pattern_count(genome, "ACG", workers) == pattern_count(genome, "ACG")
+            assert parallel_pattern_match_positions("ACG", genome, workers) == pattern_match_positions("ACG", genome)
+            assert parallel_pattern_match_positions(long_pattern, genome, workers) == pattern_match_positions(long_pattern, genome)
+            for k in (6, 20, 40):
+                assert list(parallel_frequency_map(genome, k, workers).items()) == list(frequency_map(genome, k).items())
+            assert parallel_aprox_pattern_matching(genome, pattern, 2, workers) == aprox_pattern_matching(genome, pattern, 2)
+            assert parallel_aprox_pattern_matching(genome, long_pattern, 3, workers) == aprox_pattern_matching(genome, long_pattern, 3)
+            assert parallel_skew_array(genome, workers).tolist() == skew_array(genome).tolist()
+
+def _check_greedy_motif_search(rng):
+    # the best of the workers' trials against the serial search, the first of
+    # the best trials has to win as in the serial loop
+    for trial in range(5):
+        dna = ["".join(rng.choice("ACGT" if trial else "AC") for _ in range(60)) for _ in range(6)]
+        for workers in (1, 3):
+            assert parallel_greedy_motif_search(dna, 6, 6, workers=workers) == greedy_motif_search(dna, 6, 6)
+            assert parallel_greedy_motif_search(dna, 6, 6, True, workers=workers) == greedy_motif_search_with_pseudocounts(dna, 6, 6)
+
+def _check_multistart(rng):
+    # the restarts against running randomized_motif_search with the same seeds
+    # one after the other, whatever the number of workers
+    dna = ["".join(rng.choice("ACGT") for _ in range(60)) for _ in range(6)]
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(7).spawn(20)]
+    scores = [_randomized_restart(dna, 6, 6, restart_seed)[0] for restart_seed in seeds]
+    for workers in (1, 3):
+        best_motifs, trajectory = multistart_randomized_motif_search(dna, 6, 6, restarts=20, seed=7, workers=workers)
+        assert trajectory == [min(scores[:i + 1]) for i in range(20)]
+        assert best_motifs == _randomized_restart(dna, 6, 6, seeds[scores.index(min(scores))])[1]
+        assert score(best_motifs) == trajectory[-1]
+
+    # patience stops after that many restarts in a row without improvement
+    best_motifs, trajectory = multistart_randomized_motif_search(dna, 6, 6, restarts=20, seed=7, patience=2, workers=3)
+    stale = [i for i in range(2, 20) if scores[i - 1] >= min(scores[:i - 1]) and scores[i] >= min(scores[:i - 1])]
+    assert len(trajectory) == (stale[0] + 1 if stale else 20)
+
+def test_functions():
+    rng = random.Random(0)
+    _check_scans(rng)
+    _check_greedy_motif_search(rng)
+    _check_multistart(rng)
+    print("parallel checks passed")
+
+if __name__ == '__main__':
+    test_functions()